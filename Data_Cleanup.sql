@@ -8,6 +8,15 @@
 -- 4. Removes hitch type text from Type and Description
 -- 5. Corrects Aluminum spelling variations to ALUM
 -- 6. Fixes spacing with FT measurements
+--
+-- NOTE: These steps are superseded by the Python scripts, which use the
+-- same rules as the importer (the Aluminum -> ALUM replacements in step 4
+-- are not among them):
+--   python update_hitch_types.py --dry-run   (steps 1-3, hitch_classifier.py)
+--   python standardize_data.py --dry-run     (spelling and spacing, steps 4-8,
+--                                             text_normalizer.py)
+-- Prefer those scripts; these LIKE/REPLACE chains match substrings without
+-- word boundaries (e.g. 'GN' inside 'DESIGN') and are kept for reference only.
 -- =====================================================
 
 -- STEP 1: Populate Hitch Type column
@@ -1,7 +1,8 @@
 from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, session
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user, AnonymousUserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from email_service import init_mail, send_new_item_alert, send_item_sold_alert
+from werkzeug.security import check_password_hash
+from email_service import init_mail, queue_item_sold_alerts
+from email_outbox import init_email_outbox_table, start_outbox_worker, wake_outbox_worker
 import sqlite3
 import pandas as pd
 from io import BytesIO
@@ -28,6 +29,14 @@ from blueprints.inventory_api import inventory_api_bp
 from blueprints.forms_api import forms_api_bp
 from blueprints.google_drive_routes import google_drive_bp
 from blueprints.photo_upload_routes import photo_upload_bp
+from blueprints.pricing_api import pricing_api_bp
+from data_version import init_data_version
+from bulk_upsert import init_vin_indexes
+from background_jobs import init_jobs_table, start_job_worker
+from export_checkpoints import init_export_checkpoints_table
+from audit_log import init_events_table, record_events, fetch_rows, bulk_update_events
+from login_security import client_ip, check_login_allowed, reset_login_attempts, hash_password, needs_rehash
+from user_cache import get_cached_user, cache_user, get_cached_anonymous_permissions, cache_anonymous_permissions
 
 # Load environment variables
 load_dotenv()
@@ -53,6 +62,7 @@ app.register_blueprint(inventory_api_bp)
 app.register_blueprint(forms_api_bp)
 app.register_blueprint(google_drive_bp)
 app.register_blueprint(photo_upload_bp)
+app.register_blueprint(pricing_api_bp)
 
 @app.before_request
 def set_default_category():
@@ -152,7 +162,7 @@ def init_users_db():
         ''')
         cursor.execute('SELECT COUNT(*) FROM users')
         if cursor.fetchone()[0] == 0:
-            default_password = generate_password_hash('admin123', method='pbkdf2:sha256')
+            default_password = hash_password('admin123')
             cursor.execute('INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
                          ('admin', default_password, 'admin'))
         conn.commit()
@@ -240,11 +250,34 @@ def init_classic_cars_db():
         logger.error(f"Error initializing classic cars database: {e}")
         raise
 
+def init_activity_indexes():
+    """Index the timestamp columns the activity report filters and sorts on"""
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    for table_name in ['inventory', 'trucks', 'classic_cars']:
+        for column in ['created_at', 'deleted_at', 'sold_date']:
+            try:
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})')
+            except sqlite3.OperationalError as e:
+                # Column not migrated yet on this database
+                logger.warning(f"Could not index {table_name}.{column}: {e}")
+    conn.commit()
+    conn.close()
+
 init_db()
 init_users_db()
 add_delete_permission()
 init_trucks_db()
 init_classic_cars_db()
+init_data_version()
+init_activity_indexes()
+init_events_table()
+init_vin_indexes()
+init_jobs_table()
+init_export_checkpoints_table()
+init_email_outbox_table()
+start_job_worker()
+start_outbox_worker(app, mail)
 
 class User(UserMixin):
     def __init__(self, id, username, role='user', group_id=None, group_name=None,
@@ -291,36 +324,42 @@ class User(UserMixin):
         return self.can_delete == 1
 
 
+# Permissions used when the anonymous user or its group is missing
+DEFAULT_ANONYMOUS_PERMISSIONS = (1, 0, 0, 0)
+
+def load_anonymous_permissions():
+    """Load the anonymous user's group permissions, memoized across requests"""
+    permissions = get_cached_anonymous_permissions()
+    if permissions is not None:
+        return permissions
+
+    try:
+        conn = sqlite3.connect('inventory.db')
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT g.can_view, g.can_view_financial, g.can_view_summary, g.can_view_sold
+            FROM users u
+            JOIN groups g ON u.group_id = g.id
+            WHERE u.username = 'anonymous'
+        ''')
+        result = cursor.fetchone()
+        conn.close()
+    except Exception as e:
+        # Don't cache on errors so the next request retries
+        logger.error(f"Error loading anonymous permissions: {e}")
+        return DEFAULT_ANONYMOUS_PERMISSIONS
+
+    permissions = tuple(result) if result else DEFAULT_ANONYMOUS_PERMISSIONS
+    cache_anonymous_permissions(permissions)
+    return permissions
+
+
 # AnonymousUser class
 class AnonymousUser(AnonymousUserMixin):
     def __init__(self):
-        # Load permissions from anonymous user's group
-        try:
-            conn = sqlite3.connect('inventory.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT g.can_view, g.can_view_financial, g.can_view_summary, g.can_view_sold
-                FROM users u
-                JOIN groups g ON u.group_id = g.id
-                WHERE u.username = 'anonymous'
-            ''')
-            result = cursor.fetchone()
-            conn.close()
-            if result:
-                self.can_view = result[0]
-                self.can_view_financial = result[1]
-                self.can_view_summary = result[2]
-                self.can_view_sold = result[3]
-            else:
-                self.can_view = 1
-                self.can_view_financial = 0
-                self.can_view_summary = 0
-                self.can_view_sold = 0
-        except:
-            self.can_view = 1
-            self.can_view_financial = 0
-            self.can_view_summary = 0
-            self.can_view_sold = 0
+        # Permissions from anonymous user's group (cached, no DB work per request)
+        (self.can_view, self.can_view_financial,
+         self.can_view_summary, self.can_view_sold) = load_anonymous_permissions()
 
     def has_view_permission(self):
         return self.can_view == 1
@@ -349,6 +388,10 @@ login_manager.anonymous_user = AnonymousUser
 
 @login_manager.user_loader
 def load_user(user_id):
+    cached = get_cached_user(user_id)
+    if cached is not None:
+        return cached
+
     conn = sqlite3.connect('inventory.db')
     cursor = conn.cursor()
     cursor.execute('''
@@ -363,7 +406,7 @@ def load_user(user_id):
     user_data = cursor.fetchone()
     conn.close()
     if user_data:
-        return User(
+        user = User(
             id=user_data[0],
             username=user_data[1],
             role=user_data[2],
@@ -379,6 +422,8 @@ def load_user(user_id):
             receive_sold_item_emails=user_data[12] or 0,
             email=user_data[13]
         )
+        cache_user(user_id, user)
+        return user
     return None
 
 
@@ -429,6 +474,11 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
+        # Throttle per IP and per username before doing any (expensive) hashing
+        retry_after = check_login_allowed(client_ip(request), username)
+        if retry_after:
+            return 'Too many login attempts', 429, {'Retry-After': str(int(retry_after) + 1)}
+
         conn = sqlite3.connect('inventory.db')
         cursor = conn.cursor()
         cursor.execute('SELECT id, username, password_hash, is_active FROM users WHERE username = ?', (username,))
@@ -436,11 +486,16 @@ def login():
         conn.close()
 
         if user_data and user_data[3] == 1 and check_password_hash(user_data[2], password):
-            # Update last login
+            reset_login_attempts(username)
+
+            # Update last login, moving the stored hash to the configured work factor if needed
             conn = sqlite3.connect('inventory.db')
             cursor = conn.cursor()
             cursor.execute('UPDATE users SET last_login = ? WHERE id = ?', 
                          (datetime.now().isoformat(), user_data[0]))
+            if needs_rehash(user_data[2]):
+                cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                             (hash_password(password), user_data[0]))
             conn.commit()
             conn.close()
 
@@ -869,7 +924,9 @@ def delete_selected():
         if selected_ids:
             conn = sqlite3.connect('inventory.db')
             cursor = conn.cursor()
+            before_rows = fetch_rows(cursor, table_name, [int(id) for id in selected_ids])
             cursor.executemany(f'DELETE FROM {table_name} WHERE id=?', [(int(id),) for id in selected_ids])
+            record_events(cursor, bulk_update_events(category, selected_ids, 'delete', before_rows, {}))
             conn.commit()
             conn.close()
             flash(f'{len(selected_ids)} item(s) deleted successfully!')
@@ -911,30 +968,15 @@ def mark_sold_selected():
             conn = sqlite3.connect('inventory.db')
             cursor = conn.cursor()
             current_date = date.today().isoformat()
+            before_rows = fetch_rows(cursor, table_name, [int(id) for id in selected_ids])
             cursor.executemany(f'UPDATE {table_name} SET sold=?, sold_date=? WHERE id=?', [('YES', current_date, int(id)) for id in selected_ids])
+            record_events(cursor, bulk_update_events(category, selected_ids, 'sold', before_rows,
+                                                     {'sold': 'YES', 'sold_date': current_date}))
+            # One sold alert (a digest for several units) goes out through the outbox, committed with the sale
+            queue_item_sold_alerts(cursor, [dict(row, sold='YES', sold_date=current_date) for row in before_rows.values()])
             conn.commit()
-            
-            # Send email alerts for sold items
-            try:
-                for item_id in selected_ids:
-                    cursor.execute(f'SELECT * FROM {table_name} WHERE id = ?', (int(item_id),))
-                    item = cursor.fetchone()
-                    if item:
-                        item_data = {
-                            'year': item[2],
-                            'make': item[3],
-                            'type': item[4],
-                            'description': item[7],
-                            'vin': item[9],
-                            'purchase_price': item[14],
-                            'sell_price': item[12],
-                            'sold_date': current_date
-                        }
-                        send_item_sold_alert(item_data)
-            except Exception as e:
-                logger.error(f"Failed to send sold item alert: {e}")
-            
             conn.close()
+            wake_outbox_worker()
             flash(f'{len(selected_ids)} item(s) marked as sold!')
         else:
             flash('No items selected')
@@ -956,7 +998,10 @@ def mark_unsold_selected():
         if selected_ids:
             conn = sqlite3.connect('inventory.db')
             cursor = conn.cursor()
+            before_rows = fetch_rows(cursor, table_name, [int(id) for id in selected_ids])
             cursor.executemany(f'UPDATE {table_name} SET sold=?, sold_date=? WHERE id=?', [('No', None, int(id)) for id in selected_ids])
+            record_events(cursor, bulk_update_events(category, selected_ids, 'unsold', before_rows,
+                                                     {'sold': 'No', 'sold_date': None}))
             conn.commit()
             conn.close()
             flash(f'{len(selected_ids)} item(s) marked as unsold!')
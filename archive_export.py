@@ -0,0 +1,150 @@
+"""
+Month-end archive: every category's export plus a summary, as one streamed ZIP.
+
+The archive is written incrementally into an unseekable sink (zipfile then uses
+data descriptors), and whatever has been compressed so far is yielded to the
+response, so neither the archive nor any category's rows are held in memory.
+Summary figures are tallied from the rows as they are written, in the same pass.
+"""
+
+import os
+import zipfile
+import tempfile
+import logging
+from functools import partial
+from export_pipeline import iter_export_rows, csv_chunks, write_file_export
+from xlsx_writer import XlsxExport, CURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time when copying a generated file into the archive
+ARCHIVE_READ_SIZE = 64 * 1024
+
+SUMMARY_COLUMNS = [
+    ('CATEGORY', 18, None), ('ROWS', 10, None), ('UNSOLD', 10, None), ('SOLD', 10, None),
+    ('PURCHASE TOTAL', 16, CURRENCY), ('UNSOLD LIST VALUE', 18, CURRENCY),
+    ('SALES TOTAL', 16, CURRENCY), ('PROFIT TOTAL', 16, CURRENCY)
+]
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting the archive bytes written so far"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def iter_zip(entries):
+    """
+    Yield a ZIP archive's bytes as it is written. entries is an iterable of
+    (name, chunks), chunks yielding str (UTF-8 encoded) or bytes.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, 'w') as entry:
+                for chunk in chunks:
+                    entry.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    data = sink.take()
+                    if data:
+                        yield data
+            yield sink.take()
+    yield sink.take()
+
+def _number(value):
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+def tally(rows, columns, totals):
+    """Pass export rows through, adding them to a category's summary totals"""
+    index = {column: position for position, column in enumerate(columns)}
+    sold_at, purchase_at, sell_at, profit_at = (index.get(column) for column in ('sold', 'purchase_price', 'sell_price', 'profit'))
+    for row in rows:
+        totals['rows'] += 1
+        sold = sold_at is not None and str(row[sold_at] or '').lower() == 'yes'
+        totals['sold' if sold else 'unsold'] += 1
+        if purchase_at is not None:
+            totals['purchase'] += _number(row[purchase_at])
+        if sell_at is not None:
+            totals['sales' if sold else 'list_value'] += _number(row[sell_at])
+        if sold and profit_at is not None:
+            totals['profit'] += _number(row[profit_at])
+        yield row
+
+def _file_chunks(path):
+    """Read a generated file into the archive, then remove it"""
+    try:
+        with open(path, 'rb') as file:
+            while True:
+                chunk = file.read(ARCHIVE_READ_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+def _xlsx_chunks(write):
+    """Generate an XLSX with write(path) into a temporary file and stream it; openpyxl needs a whole file to finish the workbook"""
+    descriptor, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    try:
+        write(path)
+    except Exception:
+        os.remove(path)
+        raise
+    yield from _file_chunks(path)
+
+def _write_summary(path, summary):
+    export = XlsxExport('SUMMARY', SUMMARY_COLUMNS)
+    export.header()
+    export.write_rows(_summary_rows(summary))
+    export.save(path)
+
+def _summary_rows(summary):
+    return [[category.replace('_', ' ').title(), totals['rows'], totals['unsold'], totals['sold'],
+             round(totals['purchase'], 2), round(totals['list_value'], 2),
+             round(totals['sales'], 2), round(totals['profit'], 2)]
+            for category, totals in summary.items()]
+
+def iter_export_archive(queries, file_type):
+    """
+    Yield the bytes of a ZIP with one CSV or XLSX per category and a summary file.
+    queries - [(category, sql, params, columns)] from build_export_query
+    """
+    summary = {}
+
+    def entries():
+        for category, sql, params, columns in queries:
+            totals = summary[category] = dict.fromkeys(
+                ('rows', 'unsold', 'sold', 'purchase', 'list_value', 'sales', 'profit'), 0)
+            rows = tally(iter_export_rows(sql, params), columns, totals)
+            if file_type == 'csv':
+                yield f'{category}.csv', csv_chunks(rows, columns)
+            else:
+                yield f'{category}.xlsx', _xlsx_chunks(
+                    partial(write_file_export, file_type='xlsx', category=category, columns=columns, rows=rows))
+        # Last, once every category has been tallied
+        if file_type == 'csv':
+            yield 'summary.csv', csv_chunks(_summary_rows(summary), [header for header, _, _ in SUMMARY_COLUMNS])
+        else:
+            yield 'summary.xlsx', _xlsx_chunks(partial(_write_summary, summary=summary))
+
+    try:
+        yield from iter_zip(entries())
+    except Exception as e:
+        # Headers are already sent; all that can be done is log and end the download
+        logger.error(f"Error streaming export archive: {e}")
+        raise
+
@@ -0,0 +1,108 @@
+import sqlite3
+import json
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Table name -> category name used in events
+TABLE_CATEGORIES = {
+    'inventory': 'trailers',
+    'trucks': 'trucks',
+    'classic_cars': 'classic_cars'
+}
+
+def init_events_table():
+    """Create the append-only events table and its lookup indexes"""
+    try:
+        conn = sqlite3.connect('inventory.db')
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                user_id INTEGER,
+                category TEXT NOT NULL,
+                item_id INTEGER,
+                action TEXT NOT NULL,
+                changes TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_item_id ON events (item_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)')
+        # Change-log reads per category since a position (incremental exports)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_category ON events (category, id)')
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error initializing events table: {e}")
+        raise
+
+def current_user_id():
+    """Id of the logged-in user, or None outside a request / for anonymous users"""
+    try:
+        from flask_login import current_user
+        return current_user.id if current_user.is_authenticated else None
+    except Exception:
+        return None
+
+def diff_fields(before, after):
+    """Return {field: [old, new]} for every field whose value changed"""
+    changes = {}
+    for field, new_value in after.items():
+        old_value = before.get(field) if before else None
+        if old_value != new_value:
+            changes[field] = [old_value, new_value]
+    return changes
+
+def make_event(category, item_id, action, changes=None, user_id=None):
+    """Build an event row tuple for record_events"""
+    return (
+        # UTC, the same clock as SQLite's datetime('now') behind created_at/deleted_at
+        datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        user_id if user_id is not None else current_user_id(),
+        category,
+        item_id,
+        action,
+        json.dumps(changes, default=str) if changes else None
+    )
+
+def record_events(cursor, events):
+    """
+    Append events using the caller's cursor so they commit (or roll back) in the
+    same transaction as the change they describe. Bulk callers pass every row at
+    once so the whole batch is a single executemany.
+    """
+    if not events:
+        return
+    cursor.executemany('''
+        INSERT INTO events (timestamp, user_id, category, item_id, action, changes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', events)
+
+def record_event(cursor, category, item_id, action, changes=None, user_id=None):
+    """Append a single event in the caller's transaction"""
+    record_events(cursor, [make_event(category, item_id, action, changes, user_id)])
+
+def fetch_rows(cursor, table_name, item_ids):
+    """Return {id: row dict} for the given ids in one query, used to diff before/after states"""
+    if not item_ids:
+        return {}
+    placeholders = ','.join('?' * len(item_ids))
+    cursor.execute(f'SELECT * FROM {table_name} WHERE id IN ({placeholders})', list(item_ids))
+    columns = [description[0] for description in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+def bulk_update_events(category, item_ids, action, before_rows, updates):
+    """
+    Events for a bulk UPDATE that set the same `updates` on every id. Ids missing
+    from before_rows (from fetch_rows) matched no row, so they get no event.
+    """
+    user_id = current_user_id()
+    events = []
+    for item_id in item_ids:
+        if int(item_id) not in before_rows:
+            continue
+        changes = diff_fields(before_rows[int(item_id)], updates)
+        events.append(make_event(category, int(item_id), action, changes, user_id))
+    return events
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import multiprocessing
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds the worker sleeps between checks for queued jobs when nothing wakes it
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 5))
+# A running job whose progress hasn't been touched for this long belonged to a
+# process that died; it is marked failed so it doesn't show as running forever
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+
+_handlers = {}
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+def init_jobs_table():
+    """Create the jobs table shared by every worker process"""
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            user_id INTEGER,
+            params TEXT,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            updated_at REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+    conn.commit()
+    conn.close()
+
+def register_job_handler(kind, handler):
+    """
+    handler(job_id, params, report_progress) runs one job and returns its result dict.
+    report_progress(dict) stores the latest progress for pollers.
+    """
+    _handlers[kind] = handler
+
+def enqueue_job(kind, params, user_id=None):
+    """Queue a job and wake the worker; returns the job id"""
+    job_id = uuid.uuid4().hex
+    conn = sqlite3.connect('inventory.db')
+    conn.execute('''
+        INSERT INTO jobs (id, kind, status, user_id, params, created_at, updated_at)
+        VALUES (?, ?, 'queued', ?, ?, ?, ?)
+    ''', (job_id, kind, user_id, json.dumps(params), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), time.time()))
+    conn.commit()
+    conn.close()
+    start_job_worker()
+    _wake.set()
+    return job_id
+
+def get_job(job_id):
+    """Job row as a dict with params/progress/result decoded, or None"""
+    conn = sqlite3.connect('inventory.db')
+    conn.row_factory = sqlite3.Row
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    for field in ('params', 'progress', 'result'):
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+def _update_job(job_id, **fields):
+    fields['updated_at'] = time.time()
+    conn = sqlite3.connect('inventory.db', timeout=10)
+    conn.execute(f'UPDATE jobs SET {", ".join(f"{name} = ?" for name in fields)} WHERE id = ?',
+                 list(fields.values()) + [job_id])
+    conn.commit()
+    conn.close()
+
+def _claim_next_job():
+    """Atomically move the oldest queued job to running; returns (id, kind, params) or None"""
+    conn = sqlite3.connect('inventory.db', timeout=10, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = 'Interrupted (worker stopped)', finished_at = ?
+            WHERE status = 'running' AND updated_at < ?
+        ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), time.time() - JOB_STALE_SECONDS))
+        row = conn.execute(
+            "SELECT id, kind, params FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row:
+            conn.execute('''
+                UPDATE jobs SET status = 'running', started_at = ?, updated_at = ? WHERE id = ?
+            ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), time.time(), row[0]))
+        conn.execute('COMMIT')
+        return (row[0], row[1], json.loads(row[2]) if row[2] else {}) if row else None
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def _run_job(job_id, kind, params):
+    handler = _handlers.get(kind)
+    if handler is None:
+        _update_job(job_id, status='failed', error=f'No handler for job kind {kind}',
+                    finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        return
+
+    def report_progress(progress):
+        _update_job(job_id, progress=json.dumps(progress))
+
+    try:
+        result = handler(job_id, params, report_progress)
+        _update_job(job_id, status='done', result=json.dumps(result, default=str),
+                    finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    except Exception as e:
+        logger.error(f"Job {job_id} ({kind}) failed: {e}")
+        _update_job(job_id, status='failed', error=str(e),
+                    finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+def _worker_loop():
+    while True:
+        try:
+            job = _claim_next_job()
+        except Exception as e:
+            logger.error(f"Error claiming job: {e}")
+            job = None
+        if job:
+            _run_job(*job)
+            continue
+        _wake.wait(JOB_POLL_SECONDS)
+        _wake.clear()
+
+def start_job_worker():
+    """Start this process's worker thread (once); queued jobs left from a restart get picked up"""
+    global _worker
+    if multiprocessing.parent_process() is not None:
+        # Pool processes (e.g. parallel sheet imports) re-import the app; jobs run in the app process
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name='job-worker', daemon=True)
+            _worker.start()
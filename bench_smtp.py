@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark email delivery against a local SMTP stand-in: one connection per message
+(mail.send) versus the outbox's reused connection (email_outbox.MailSession).
+
+The stand-in accepts everything and delays its greeting by --handshake-ms to stand
+in for what a real server costs per connection (TCP, TLS handshake, login).
+Nothing is read from or written to inventory.db.
+
+    python bench_smtp.py
+    python bench_smtp.py --messages 500 --handshake-ms 150 --max-per-connection 100
+"""
+
+import time
+import argparse
+import threading
+import socketserver
+from flask import Flask
+from flask_mail import Mail, Message
+from email_outbox import MailSession, EMAIL_MAX_PER_CONNECTION
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: greeting, EHLO, MAIL/RCPT, DATA, QUIT"""
+
+    def handle(self):
+        self.server.connections += 1
+        time.sleep(self.server.handshake_seconds)
+        self.wfile.write(b'220 stand-in ready\r\n')
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line == b'.\r\n':
+                    in_data = False
+                    self.server.messages += 1
+                    self.wfile.write(b'250 queued\r\n')
+                continue
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.wfile.write(b'250 stand-in\r\n')
+            elif command == b'DATA':
+                in_data = True
+                self.wfile.write(b'354 end with .\r\n')
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            else:
+                self.wfile.write(b'250 ok\r\n')
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def start_stand_in(handshake_seconds):
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.handshake_seconds = handshake_seconds
+    server.connections = server.messages = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_app(port):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                      MAIL_DEFAULT_SENDER='bench@localhost')
+    return app, Mail(app)
+
+def messages(count):
+    for number in range(count):
+        yield Message(subject=f'Benchmark {number}', recipients=['alerts@localhost'], html='<p>Benchmark</p>')
+
+def run(label, server, send_all, count):
+    server.connections = server.messages = 0
+    started = time.perf_counter()
+    send_all()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<28} {count} messages in {elapsed:6.2f}s  {count / elapsed:8.1f} msg/s  '
+          f'{server.connections} connections')
+    return count / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--handshake-ms', type=float, default=50,
+                        help='delay per new connection, standing in for TLS and login')
+    parser.add_argument('--max-per-connection', type=int, default=EMAIL_MAX_PER_CONNECTION)
+    args = parser.parse_args()
+
+    server = start_stand_in(args.handshake_ms / 1000)
+    app, mail = make_app(server.server_address[1])
+    try:
+        with app.app_context():
+            def one_connection_each():
+                for message in messages(args.messages):
+                    mail.send(message)
+
+            def reused_connection():
+                with MailSession(mail, args.max_per_connection) as session:
+                    for message in messages(args.messages):
+                        session.send(message)
+
+            before = run('connection per message', server, one_connection_each, args.messages)
+            after = run(f'reused (max {args.max_per_connection}/connection)', server, reused_connection, args.messages)
+        print(f'speedup: {after / before:.1f}x')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
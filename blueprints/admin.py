@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 import sqlite3
 import logging
 from functools import wraps
+from login_security import hash_password
+from user_cache import invalidate_user, invalidate_all_users, invalidate_anonymous_permissions
 
 # Create logger
 logger = logging.getLogger(__name__)
@@ -180,6 +182,10 @@ def api_edit_group(group_id):
         conn.commit()
         conn.close()
 
+        # Permissions of every member changed, possibly including the anonymous user's group
+        invalidate_all_users()
+        invalidate_anonymous_permissions()
+
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"Error updating group: {e}")
@@ -255,7 +261,7 @@ def admin_add_user():
         group = cursor.fetchone()
         role = group[0].lower() if group else 'user'
         
-        password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        password_hash = hash_password(password)
         cursor.execute('''
             INSERT INTO users (username, password_hash, role, email, group_id)
             VALUES (?, ?, ?, ?, ?)
@@ -296,11 +302,14 @@ def admin_edit_user(user_id):
         ''', (email if email else None, group_id, role, is_active, user_id))
         
         if new_password:
-            password_hash = generate_password_hash(new_password, method='pbkdf2:sha256')
+            password_hash = hash_password(new_password)
             cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
         
         conn.commit()
         conn.close()
+        invalidate_user(user_id)
+        # The edited user may be 'anonymous' moving to another group
+        invalidate_anonymous_permissions()
 
         flash('User updated successfully')
     except Exception as e:
@@ -323,6 +332,7 @@ def admin_delete_user(user_id):
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         conn.commit()
         conn.close()
+        invalidate_user(user_id)
 
         flash('User deleted successfully')
     except Exception as e:
@@ -440,194 +450,173 @@ def test_email():
         logger.error(f"Error sending test email: {e}")
         return jsonify({'error': f'Failed to send email: {str(e)}'}), 500
 
-@admin_bp.route('/api/activity-report', methods=['GET'])
+@admin_bp.route('/api/email-outbox', methods=['GET'])
 @login_required
 @admin_required
-def api_activity_report():
+def api_email_outbox():
+    """Queued, sent and dead email alerts; ?status=dead shows the ones that gave up"""
     try:
-        conn = sqlite3.connect('inventory.db')
-        cursor = conn.cursor()
-        
-        # Get new items from last 7 days
-        new_items = []
-        
-        # Trailers (inventory table)
-        cursor.execute('''
-            SELECT id, year, make, type, vin, created_at, 'trailers' as category
-            FROM inventory
-            WHERE created_at >= datetime('now', '-7 days')
-            AND deleted_at IS NULL
-            ORDER BY created_at DESC
-        ''')
-        new_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],
-            'vin': row[4],
-            'created_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Bucket Trucks (use model instead of type)
-        cursor.execute('''
-            SELECT id, year, make, model, vin, created_at, 'trucks' as category
-            FROM trucks
-            WHERE created_at >= datetime('now', '-7 days')
-            AND deleted_at IS NULL
-            ORDER BY created_at DESC
-        ''')
-        new_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],  # Using model as type
-            'vin': row[4],
-            'created_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Classic Cars (use model instead of type)
-        cursor.execute('''
-            SELECT id, year, make, model, vin, created_at, 'classic_cars' as category
-            FROM classic_cars
-            WHERE created_at >= datetime('now', '-7 days')
-            AND deleted_at IS NULL
-            ORDER BY created_at DESC
-        ''')
-        new_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],  # Using model as type
-            'vin': row[4],
-            'created_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Get deleted items from last 7 days
-        deleted_items = []
-        
-        # Trailers
-        cursor.execute('''
-            SELECT id, year, make, type, vin, deleted_at, 'trailers' as category
-            FROM inventory
-            WHERE deleted_at >= datetime('now', '-7 days')
-            ORDER BY deleted_at DESC
-        ''')
-        deleted_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],
-            'vin': row[4],
-            'deleted_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Bucket Trucks
-        cursor.execute('''
-            SELECT id, year, make, model, vin, deleted_at, 'trucks' as category
-            FROM trucks
-            WHERE deleted_at >= datetime('now', '-7 days')
-            ORDER BY deleted_at DESC
-        ''')
-        deleted_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],  # Using model as type
-            'vin': row[4],
-            'deleted_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Classic Cars
-        cursor.execute('''
-            SELECT id, year, make, model, vin, deleted_at, 'classic_cars' as category
-            FROM classic_cars
-            WHERE deleted_at >= datetime('now', '-7 days')
-            ORDER BY deleted_at DESC
-        ''')
-        deleted_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],  # Using model as type
-            'vin': row[4],
-            'deleted_at': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        # Get sold items from last 7 days
-        sold_items = []
-        
-        # Trailers
-        cursor.execute('''
-            SELECT id, year, make, type, vin, sold_date, 'trailers' as category
-            FROM inventory
-            WHERE sold_date >= date('now', '-7 days')
-            AND (sold = "YES" OR sold = "yes")
-            ORDER BY sold_date DESC
+        from email_outbox import list_outbox
+        return jsonify(list_outbox(request.args.get('status'), request.args.get('limit', 100, type=int)))
+    except Exception as e:
+        logger.error(f"Error listing email outbox: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/api/email-outbox/<int:email_id>/retry', methods=['POST'])
+@login_required
+@admin_required
+def api_retry_email(email_id):
+    """Send a dead-lettered alert again"""
+    try:
+        from email_outbox import retry_email
+        if not retry_email(email_id):
+            return jsonify({'error': 'Email not found or already sent'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        logger.error(f"Error retrying email {email_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Category -> (table, column shown as "type" in the report)
+ACTIVITY_SOURCES = {
+    'trailers': ('inventory', 'type'),
+    'trucks': ('trucks', 'model'),
+    'classic_cars': ('classic_cars', 'model')
+}
+
+def build_activity_query(categories):
+    """
+    Build one UNION ALL over the new/deleted/sold events of the given categories.
+    Each branch filters on a single indexed timestamp column; the window totals are
+    computed before LIMIT so one round trip returns the page and its counts.
+    """
+    branches = []
+    for category in categories:
+        table_name, type_column = ACTIVITY_SOURCES[category]
+        columns = f"id, year, make, {type_column} AS type, vin, '{category}' AS category"
+        branches.append(f'''
+            SELECT 'new' AS event, created_at AS event_time, {columns}
+            FROM {table_name}
+            WHERE created_at >= datetime('now', :window)
+            AND +deleted_at IS NULL  -- unary + keeps the planner on the created_at index
         ''')
-        sold_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],
-            'vin': row[4],
-            'sold_date': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Bucket Trucks
-        cursor.execute('''
-            SELECT id, year, make, model, vin, sold_date, 'trucks' as category
-            FROM trucks
-            WHERE sold_date >= date('now', '-7 days')
-            AND (sold = "YES" OR sold = "yes")
-            ORDER BY sold_date DESC
+        branches.append(f'''
+            SELECT 'deleted' AS event, deleted_at AS event_time, {columns}
+            FROM {table_name}
+            WHERE deleted_at >= datetime('now', :window)
         ''')
-        sold_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],
-            'vin': row[4],
-            'sold_date': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        # Classic Cars
-        cursor.execute('''
-            SELECT id, year, make, model, vin, sold_date, 'classic_cars' as category
-            FROM classic_cars
-            WHERE sold_date >= date('now', '-7 days')
+        branches.append(f'''
+            SELECT 'sold' AS event, sold_date AS event_time, {columns}
+            FROM {table_name}
+            WHERE sold_date >= date('now', :window)
             AND (sold = "YES" OR sold = "yes")
-            ORDER BY sold_date DESC
         ''')
-        sold_items.extend([{
-            'id': row[0],
-            'year': row[1],
-            'make': row[2],
-            'type': row[3],
-            'vin': row[4],
-            'sold_date': row[5],
-            'category': row[6]
-        } for row in cursor.fetchall()])
-        
-        conn.close()
-        
-        return jsonify({
-            'new_items': new_items,
-            'deleted_items': deleted_items,
-            'sold_items': sold_items  # ADD THIS
+
+    # Who did it comes from the events log, looked up only for the rows on this page.
+    # Imported units were created by their first 'import' event; later ones are re-imports.
+    return f'''
+        SELECT page.*,
+               (SELECT u.username
+                FROM events e
+                JOIN users u ON e.user_id = u.id
+                WHERE e.id = (
+                    SELECT CASE page.event WHEN 'new' THEN MIN(x.id) ELSE MAX(x.id) END
+                    FROM events x
+                    WHERE x.item_id = page.id
+                    AND x.category = page.category
+                    AND x.user_id IS NOT NULL
+                    AND CASE page.event
+                            WHEN 'new' THEN x.action IN ('create', 'import')
+                            WHEN 'deleted' THEN x.action = 'delete'
+                            ELSE x.action = 'sold'
+                        END)) AS username
+        FROM (
+            SELECT event, event_time, id, year, make, type, vin, category,
+                   COUNT(*) OVER () AS total,
+                   SUM(event = 'new') OVER () AS new_count,
+                   SUM(event = 'deleted') OVER () AS deleted_count,
+                   SUM(event = 'sold') OVER () AS sold_count
+            FROM ({' UNION ALL '.join(branches)})
+            ORDER BY event_time DESC
+            LIMIT :limit OFFSET :offset
+        ) page
+        ORDER BY page.event_time DESC
+    '''
+
+@admin_bp.route('/api/activity-report', methods=['GET'])
+@login_required
+@admin_required
+def api_activity_report():
+    """
+    Activity timeline for the last `days` days (default 7, max 365).
+    Optional `category` (trailers, trucks, classic_cars) and `page`/`per_page` pagination.
+    """
+    try:
+        days = min(max(request.args.get('days', 7, type=int), 1), 365)
+        category = request.args.get('category', 'all')
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 200, type=int), 1), 1000)
+
+        if category == 'all':
+            categories = list(ACTIVITY_SOURCES)
+        elif category in ACTIVITY_SOURCES:
+            categories = [category]
+        else:
+            return jsonify({'error': 'Invalid category'}), 400
+
+        conn = sqlite3.connect('inventory.db')
+        cursor = conn.cursor()
+        cursor.execute(build_activity_query(categories), {
+            'window': f'-{days} days',
+            'limit': per_page,
+            'offset': (page - 1) * per_page
         })
-    
+        rows = cursor.fetchall()
         conn.close()
-        
+
+        timeline = []
+        grouped = {'new': [], 'deleted': [], 'sold': []}
+        # Grouped lists keep the timestamp under the column name the report page expects
+        time_keys = {'new': 'created_at', 'deleted': 'deleted_at', 'sold': 'sold_date'}
+        for row in rows:
+            item = {
+                'event': row[0],
+                'event_time': row[1],
+                'id': row[2],
+                'year': row[3],
+                'make': row[4],
+                'type': row[5],
+                'vin': row[6],
+                'category': row[7],
+                'username': row[12]
+            }
+            timeline.append(item)
+            grouped[row[0]].append({
+                'id': row[2],
+                'year': row[3],
+                'make': row[4],
+                'type': row[5],
+                'vin': row[6],
+                time_keys[row[0]]: row[1],
+                'category': row[7],
+                'username': row[12]
+            })
+
+        first = rows[0] if rows else None
         return jsonify({
-            'new_items': new_items,
-            'deleted_items': deleted_items
+            'days': days,
+            'category': category,
+            'page': page,
+            'per_page': per_page,
+            'total': first[8] if first else 0,
+            'counts': {
+                'new': first[9] if first else 0,
+                'deleted': first[10] if first else 0,
+                'sold': first[11] if first else 0
+            },
+            'timeline': timeline,
+            'new_items': grouped['new'],
+            'deleted_items': grouped['deleted'],
+            'sold_items': grouped['sold']
         })
     except Exception as e:
         logger.error(f"Error fetching activity report: {e}")
@@ -672,10 +661,11 @@ def account_settings():
                     return redirect(url_for('admin.account_settings'))
 
                 # Update password
-                new_password_hash = generate_password_hash(new_password, method='pbkdf2:sha256')
+                new_password_hash = hash_password(new_password)
                 cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_password_hash, current_user.id))
                 conn.commit()
                 conn.close()
+                invalidate_user(current_user.id)
 
                 flash('Password changed successfully!')
                 return redirect(url_for('index'))
@@ -693,6 +683,7 @@ def account_settings():
                                (receive_new_item_emails, receive_sold_item_emails, current_user.id))
                 conn.commit()
                 conn.close()
+                invalidate_user(current_user.id)
                 
                 flash('Notification preferences updated successfully!')
                 return redirect(url_for('admin.account_settings'))
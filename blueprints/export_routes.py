@@ -1,12 +1,23 @@
-from flask import Blueprint, send_file, redirect, url_for, flash, session, request, jsonify
-from flask_login import login_required
+from flask import Blueprint, send_file, redirect, url_for, flash, session, request, jsonify, Response, current_app
+from flask_login import login_required, current_user
+import os
+import time
 import sqlite3
-import pandas as pd
-from io import BytesIO
 import logging
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
 from datetime import datetime, timedelta
+from export_pipeline import (CATEGORY_TABLES, SOLD_FILTERS, build_export_query, iter_export_rows, iter_csv,
+                             count_export_rows, report_rows, write_file_export)
+from xlsx_writer import XlsxExport, XLSX_MIMETYPE, REQUIREMENT
+from listing_renderer import MARKETPLACES, compile_listing_template, iter_listing_rows
+from export_cache import export_cache_key, cached_export, store_export, stream_into_cache
+from data_version import get_data_version
+from audit_log import fetch_rows
+from export_checkpoints import latest_event_id, get_checkpoint, save_checkpoint, changes_since
+from archive_export import iter_export_archive
+from columnar_export import COLUMNAR_MIMETYPES, column_types, write_columnar
+from export_artifacts import (artifact_path, artifact_expired, sign_download, load_download, purge_expired_artifacts,
+                              EXPORT_ARTIFACT_TTL_SECONDS)
+from background_jobs import register_job_handler, enqueue_job, get_job
 
 # Create logger
 logger = logging.getLogger(__name__)
@@ -29,421 +40,397 @@ def view_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def wants_json():
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest' or \
+        request.accept_mimetypes.best == 'application/json'
+
+def send_export(path, key, mimetype, download_name):
+    """Send a cached export; a client that already has this version gets 304 Not Modified"""
+    # send_file resolves relative paths against the app root, not the working directory
+    response = send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         etag=key, conditional=True)
+    # Always revalidate: the key changes as soon as the data does
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def export_filters():
+    """(category, columns, sold, include_deleted) from an export's query parameters"""
+    category = request.args.get('category', session.get('category', 'trailers'))
+    columns = [column.strip() for value in request.args.getlist('columns') for column in value.split(',') if column.strip()]
+    sold = request.args.get('sold', 'all')
+    include_deleted = request.args.get('deleted') == '1' and current_user.is_admin()
+    return category, columns, sold, include_deleted
+
 @export_bp.route('/export/<file_type>')
 @view_required
 def export_file(file_type):
-    category = session.get('category', 'trailers')
-    table_name = 'inventory' if category == 'trailers' else category
+    """
+    Export a category as CSV or XLSX. Query parameters:
+      category   - defaults to the current category
+      columns    - comma-separated column names (default every column)
+      sold       - all (default), unsold or sold
+      deleted    - 1 to include soft-deleted rows (admins only)
+      background - 1 to generate it in a background job (unless already cached)
+    """
+    if file_type not in ('csv', 'xlsx'):
+        flash('Invalid export format')
+        return redirect(url_for('index'))
+
+    category, columns, sold, include_deleted = export_filters()
 
     try:
         conn = sqlite3.connect('inventory.db')
-        df = pd.read_sql_query(f'SELECT * FROM {table_name}', conn)
-        conn.close()
+        try:
+            sql, params, columns = build_export_query(conn, category, columns, sold, include_deleted)
+            data_version = get_data_version(conn.cursor(), CATEGORY_TABLES[category])
+        finally:
+            conn.close()
+
+        key = export_cache_key('file', category, {
+            'type': file_type, 'columns': columns, 'sold': sold, 'deleted': include_deleted
+        }, data_version=data_version)
+        mimetype = 'text/csv' if file_type == 'csv' else XLSX_MIMETYPE
+        download_name = f'{category}.{file_type}'
+
+        path = cached_export(key, file_type)
+        if path:
+            return send_export(path, key, mimetype, download_name)
+
+        if request.args.get('background') == '1':
+            return start_export_job({'exporter': 'file', 'file_type': file_type, 'category': category,
+                                     'columns': columns, 'sold': sold, 'deleted': include_deleted})
 
-        # Remove ID column
-        df = df.drop(columns=['id'], errors='ignore')
-
-        output = BytesIO()
         if file_type == 'csv':
-            df.to_csv(output, index=False)
-            output.seek(0)
-            return send_file(output, mimetype='text/csv', as_attachment=True, download_name=f'{category}.csv')
-        elif file_type == 'xlsx':
-            df.to_excel(output, index=False, engine='openpyxl')
-            output.seek(0)
-            return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=f'{category}.xlsx')
-        else:
-            flash('Invalid export format')
-            return redirect(url_for('index'))
+            # Streamed from the cursor, so the table is never held in memory, and cached as it goes
+            response = Response(stream_into_cache(key, 'csv', iter_csv(sql, params, columns)), mimetype=mimetype,
+                                headers={'Content-Disposition': f'attachment; filename={download_name}'})
+            response.set_etag(key)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+
+        path = store_export(key, 'xlsx', lambda target: write_file_export(
+            target, 'xlsx', category, columns, iter_export_rows(sql, params)))
+        return send_export(path, key, mimetype, download_name)
     except Exception as e:
         logger.error(f"Error exporting file: {e}")
         flash(f'Error exporting file: {str(e)}')
         return redirect(url_for('index'))
 
-@export_bp.route('/export/facebook', methods=['GET', 'POST'])
-@login_required
+@export_bp.route('/export/<category>.<any(parquet, arrow):file_format>')
 @view_required
-def export_facebook():
+def export_columnar(category, file_format):
+    """
+    Export a category as Parquet or an Arrow IPC file with a typed schema (real
+    dates, float64 prices, boolean sold). Takes the same columns/sold/deleted
+    parameters as export_file.
+    """
+    _, columns, sold, include_deleted = export_filters()
     try:
         conn = sqlite3.connect('inventory.db')
-        cursor = conn.cursor()
+        try:
+            sql, params, columns = build_export_query(conn, category, columns, sold, include_deleted)
+            types = column_types(conn, CATEGORY_TABLES[category], columns)
+            data_version = get_data_version(conn.cursor(), CATEGORY_TABLES[category])
+        finally:
+            conn.close()
+
+        key = export_cache_key('columnar', category, {
+            'type': file_format, 'columns': columns, 'sold': sold, 'deleted': include_deleted
+        }, data_version=data_version)
+        path = cached_export(key, file_format) or store_export(key, file_format, lambda target: write_columnar(
+            target, file_format, sql, params, columns, types))
+        return send_export(path, key, COLUMNAR_MIMETYPES[file_format], f'{category}.{file_format}')
+    except Exception as e:
+        logger.error(f"Error exporting {file_format}: {e}")
+        flash(f'Error exporting {file_format}: {str(e)}')
+        return redirect(url_for('index'))
 
-        # Check if this is a POST request with selected IDs
+@export_bp.route('/export/all.zip')
+@view_required
+def export_all_zip():
+    """
+    Every category in one streamed ZIP: a CSV (default) or XLSX per category plus
+    a summary. Query parameters: format (csv or xlsx), sold, deleted (admins only).
+    """
+    file_type = request.args.get('format', 'csv')
+    if file_type not in ('csv', 'xlsx'):
+        flash('Invalid export format')
+        return redirect(url_for('index'))
+    _, _, sold, include_deleted = export_filters()
+
+    try:
+        conn = sqlite3.connect('inventory.db')
+        try:
+            # Built up front so a bad filter is reported before the download starts
+            queries = [(category,) + build_export_query(conn, category, sold=sold, include_deleted=include_deleted)
+                       for category in CATEGORY_TABLES]
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error exporting archive: {e}")
+        flash(f'Error exporting archive: {str(e)}')
+        return redirect(url_for('index'))
+
+    download_name = f"inventory_{datetime.now().strftime('%Y-%m-%d')}.zip"
+    return Response(iter_export_archive(queries, file_type), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={download_name}'})
+
+def select_listing_items(cursor, table_name, item_ids=None):
+    """Run the unsold-items query for a listing export: the given ids (possibly none), or everything"""
+    if item_ids is not None:
+        placeholders = ','.join('?' * len(item_ids))
+        cursor.execute(f'''
+            SELECT * FROM {table_name} 
+            WHERE id IN ({placeholders})
+            AND {SOLD_FILTERS['unsold']} 
+            AND deleted_at IS NULL 
+            ORDER BY id
+        ''', item_ids)
+    else:
+        # Export everything (unsold only)
+        cursor.execute(f'''
+            SELECT * FROM {table_name} 
+            WHERE {SOLD_FILTERS['unsold']} 
+            AND deleted_at IS NULL 
+            ORDER BY id
+        ''')
+
+def write_listing_workbook(path, cursor, marketplace, category, item_ids=None, removals=None, progress=None):
+    """
+    Write the marketplace sheet for the given ids (or every unsold item), plus a
+    Remove sheet when removals [(id, reason)] is given. progress(dict) is called
+    as rows are written.
+    """
+    template = MARKETPLACES[marketplace]
+    table_name = CATEGORY_TABLES[category]
+    render = compile_listing_template(marketplace, category)
+
+    export = XlsxExport(template['sheet_title'], [
+        (header, width, style) for header, width, style, _ in template['columns']
+    ])
+    for text, style in template['banners']:
+        export.banner(text, style)
+    export.styled_row([requirement for _, _, _, requirement in template['columns']], REQUIREMENT)
+    export.header()
+    total = None
+    if progress and item_ids is None:
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {SOLD_FILTERS['unsold']} AND deleted_at IS NULL")
+        total = cursor.fetchone()[0]
+    elif progress:
+        total = len(item_ids)
+    # Rows go from the cursor, rendered a batch at a time, straight into the sheet
+    select_listing_items(cursor, table_name, item_ids)
+    rows = iter_listing_rows(cursor, render)
+    export.write_rows(report_rows(rows, total, progress) if progress else rows)
+
+    if removals is not None:
+        # Listings to take down, identified by the title they were uploaded with
+        export.add_sheet('Remove', [('ID', 10, None), ('VIN', 22, None), ('TITLE', 50, None), ('REASON', 12, None)])
+        export.header()
+        removed = fetch_rows(cursor, table_name, [item_id for item_id, _ in removals])
+        titles = {}
+        if removed:
+            names = list(next(iter(removed.values())))
+            titles = dict(zip(removed, (row[0] for row in render({name: [row[name] for row in removed.values()] for name in names}))))
+        export.write_rows([item_id, (removed.get(item_id) or {}).get('vin'), titles.get(item_id), reason]
+                          for item_id, reason in removals)
+
+    export.save(path)
+
+def plan_listing_export(cursor, marketplace, category, item_ids=None, incremental=False):
+    """
+    What a listing export covers: (until_event_id, since_event_id, item_ids, removals).
+    item_ids None means every unsold item. Incremental exports take the items changed
+    since the marketplace's checkpoint and the removals; the others have no removals.
+    """
+    # Read first: changes made while the export is written fall after the checkpoint
+    until_event_id = latest_event_id(cursor)
+    if not incremental:
+        return until_event_id, None, item_ids, None
+    checkpoint = get_checkpoint(cursor, marketplace, category)
+    if not checkpoint:
+        # Nothing to diff against: everything is new
+        return until_event_id, 0, None, []
+    listable, removals = changes_since(cursor, CATEGORY_TABLES[category], category, checkpoint['event_id'], until_event_id)
+    return until_event_id, checkpoint['event_id'], listable, removals
+
+def export_listings(marketplace):
+    """
+    Unsold items of the current category as a marketplace bulk-upload workbook.
+    POST {ids} exports a selection. GET exports everything, or with ?mode=changes
+    only what was added or changed since the last export to this marketplace plus a
+    Remove sheet of sold and deleted units. Incremental exports (and full ones with
+    ?checkpoint=1) move the checkpoint once the workbook is delivered.
+    ?background=1 (or "background": true in the POST body) generates it in a
+    background job instead; its checkpoint moves when the download link is used.
+    """
+    template = MARKETPLACES[marketplace]
+    try:
+        data = request.get_json(silent=True) or {}
+        item_ids = None
         if request.method == 'POST':
-            data = request.json
             item_ids = data.get('ids', [])
             if not item_ids:
                 return jsonify({'error': 'No items selected'}), 400
-            
-            placeholders = ','.join('?' * len(item_ids))
-            cursor.execute(f'''
-                SELECT * FROM inventory 
-                WHERE id IN ({placeholders})
-                AND sold = "No" 
-                AND deleted_at IS NULL 
-                ORDER BY id
-            ''', item_ids)
-        else:
-            # Export everything (unsold only)
-            cursor.execute('''
-                SELECT * FROM inventory 
-                WHERE sold = "No" 
-                AND deleted_at IS NULL 
-                ORDER BY id
-            ''')
-        
-        items = cursor.fetchall()
-        conn.close()
+        category = data.get('category') or request.args.get('category', session.get('category', 'trailers'))
+        if category not in CATEGORY_TABLES:
+            raise ValueError(f'Unknown category: {category}')
+        incremental = request.method == 'GET' and request.args.get('mode') == 'changes'
+        checkpoint = incremental or (request.method == 'GET' and request.args.get('checkpoint') == '1')
+
+        if request.args.get('background') == '1' or data.get('background'):
+            return start_export_job({'exporter': marketplace, 'category': category, 'ids': item_ids,
+                                     'mode': 'changes' if incremental else None, 'checkpoint': checkpoint})
 
-        # Prepare data for Facebook Marketplace format
-        fb_data = []
-
-        for item in items:
-            # Map condition to Facebook's exact required values
-            condition = item[8] or ''
-            if condition.lower() in ['new', 'brand new']:
-                fb_condition = 'New'
-            elif condition.lower() in ['excellent', 'like new']:
-                fb_condition = 'Used - Like New'
-            elif condition.lower() in ['good', 'very good']:
-                fb_condition = 'Used - Good'
-            elif condition.lower() in ['fair', 'acceptable']:
-                fb_condition = 'Used - Fair'
+        conn = sqlite3.connect('inventory.db')
+        try:
+            cursor = conn.cursor()
+            until_event_id, since_event_id, listable, removals = plan_listing_export(
+                cursor, marketplace, category, item_ids, incremental)
+            download_name = listing_download_name(marketplace, incremental)
+
+            if incremental:
+                key = export_cache_key(marketplace, category, {'since': since_event_id, 'until': until_event_id})
+                path = store_export(key, 'xlsx', lambda target: write_listing_workbook(
+                    target, cursor, marketplace, category, listable, removals))
             else:
-                fb_condition = 'Used - Good'
-
-            # Build TITLE from Length, Year, Make, Type, VIN (max 150 chars)
-            title_parts = []
-            if item[1]:  # Length
-                title_parts.append(f"{int(item[1])}FT")
-            if item[2]:  # Year
-                title_parts.append(str(item[2]))
-            if item[3]:  # Make
-                title_parts.append(item[3].upper())
-            if item[4]:  # Type
-                title_parts.append(item[4].upper())
-
-            title = " ".join(title_parts)
-
-            # Add full VIN to title if available
-            if item[9]:  # VIN
-                if title:
-                    title += " - "
-                title += item[9]
-
-            # Truncate to 150 characters as required
-            title = title[:150]
-
-            # Build DESCRIPTION from Length x Width, Capacity, Description (max 5000 chars)
-            desc_parts = []
-            
-            # Add Length x Width format (e.g., "12FT X 83IN")
-            if item[1] and item[5]:  # Length and Width
-                desc_parts.append(f"{int(item[1])}FT X {item[5]}IN")
-            elif item[1]:  # Length only
-                desc_parts.append(f"{int(item[1])}FT")
-            elif item[5]:  # Width only
-                desc_parts.append(f"{item[5]}IN")
-            
-            if item[6]:  # Capacity
-                desc_parts.append(item[6].upper())
-
-            description = ", ".join(desc_parts)
-
-            # Add main description
-            if item[7]:  # Description
-                if description:
-                    description += " - "
-                description += item[7].upper()
-
-            # Add LAST 7 of VIN to description - FIXED
-            if item[9]:  # VIN
-                vin_short = item[9][-7:] if len(item[9]) >= 7 else item[9]
-                if description:
-                    description += " "
-                description += vin_short
-
-            # Add location message
-            if description:
-                description += ". "
-            description += "VISIT GOODNIGHT TRAILERS, LOCATED OFF I-27 IN CANYON!"
-
-            # Truncate to 5000 characters as required
-            description = description[:5000]
-
-            # Get PRICE (required, as currency)
-            # item[12] is sell_price (item[11] is hitch_type)
-            price = float(item[12]) if item[12] else 0.0
-
-            # Add row to Facebook data
-            fb_data.append([title, price, fb_condition, description, 'Miscellaneous'])
-
-        # Create Excel workbook manually to match exact template format
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Bulk Upload Template"
-
-        # Row 1: Main title (merged across all columns)
-        ws.merge_cells('A1:E1')
-        cell_a1 = ws['A1']
-        cell_a1.value = "Facebook Marketplace Bulk Upload Template"
-        cell_a1.font = Font(bold=True, size=11)
-        cell_a1.alignment = Alignment(horizontal='left', vertical='center')
-
-        # Row 2: Instructions (merged across all columns)
-        ws.merge_cells('A2:E2')
-        cell_a2 = ws['A2']
-        cell_a2.value = "You can create up to 50 listings at once. When you are finished, be sure to save or export this as an XLS/XLSX file."
-        cell_a2.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-
-        # Row 3: Format requirements for each column
-        format_requirements = [
-            'REQUIRED | Plain text (up to 150 characters',
-            'REQUIRED | A whole number in $',
-            'REQUIRED | Supported values: "New"; "Used - Like New"; "Used - Good"; "Used - Fair"',
-            'OPTIONAL | Plain text (up to 5000 characters)',
-            'OPTIONAL | Type of listing'
-        ]
-        for col_idx, req in enumerate(format_requirements, start=1):
-            cell = ws.cell(row=3, column=col_idx)
-            cell.value = req
-            cell.alignment = Alignment(wrap_text=True, vertical='top')
-
-        # Row 4: Column headers
-        headers = ['TITLE', 'PRICE', 'CONDITION', 'DESCRIPTION', 'CATEGORY']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=4, column=col_idx)
-            cell.value = header
-            cell.font = Font(bold=True)
-
-        # Data rows starting from row 5
-        for row_idx, row_data in enumerate(fb_data, start=5):
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                # Format price column (column B) as currency
-                if col_idx == 2:  # PRICE column
-                    cell.number_format = '$#,##0.00'
-
-        # Set column widths to match template
-        ws.column_dimensions['A'].width = 50  # TITLE
-        ws.column_dimensions['B'].width = 12  # PRICE
-        ws.column_dimensions['C'].width = 20  # CONDITION
-        ws.column_dimensions['D'].width = 80  # DESCRIPTION
-        ws.column_dimensions['E'].width = 20  # CATEGORY
-
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='facebook_marketplace_export.xlsx'
-        )
+                key = export_cache_key(marketplace, category, ids=item_ids,
+                                       data_version=get_data_version(cursor, CATEGORY_TABLES[category]))
+                path = cached_export(key, 'xlsx') or store_export(key, 'xlsx', lambda target: write_listing_workbook(
+                    target, cursor, marketplace, category, item_ids))
+
+            response = send_export(path, key, XLSX_MIMETYPE, download_name)
+            if checkpoint:
+                # Only once the workbook is written and ready to send; a failed export leaves the checkpoint alone
+                save_checkpoint(cursor, marketplace, category, until_event_id, current_user.id)
+                conn.commit()
+        finally:
+            conn.close()
+
+        return response
 
     except Exception as e:
-        logger.error(f"Error exporting to Facebook format: {e}")
-        flash(f'Error exporting to Facebook format: {str(e)}')
+        logger.error(f"Error exporting to {template['label']} format: {e}")
+        flash(f"Error exporting to {template['label']} format: {str(e)}")
         return redirect(url_for('index'))
-    
-@export_bp.route('/export/squarespace')
-@export_bp.route('/export/squarespace/<filter_type>')
-@login_required
-@view_required
-def export_squarespace(filter_type='all'):
+
+def listing_download_name(marketplace, incremental=False):
+    download_name = MARKETPLACES[marketplace]['download_name']
+    return download_name.replace('.xlsx', '_changes.xlsx') if incremental else download_name
+
+def start_export_job(params):
+    """Queue an export and answer with where to follow it"""
+    params['user_id'] = current_user.id
+    job_id = enqueue_job('export', params, user_id=current_user.id)
+    if wants_json():
+        return jsonify({'job_id': job_id, 'status_url': url_for('export.export_status', job_id=job_id)}), 202
+    flash('Export started. The download link will appear here when it is ready.')
+    return redirect(url_for('index', export_job=job_id))
+
+def run_export_job(job_id, params, report_progress):
+    """Background job handler: write an export to the artifact directory for a signed download link"""
+    purge_expired_artifacts()
+    exporter, category = params['exporter'], params['category']
+    conn = sqlite3.connect('inventory.db')
     try:
-        conn = sqlite3.connect('inventory.db')
+        if exporter == 'file':
+            file_type = params['file_type']
+            sql, query_params, columns = build_export_query(conn, category, params['columns'], params['sold'],
+                                                            params['deleted'])
+            total = count_export_rows(conn, sql, query_params)
+            path = artifact_path(job_id, file_type)
+            write_file_export(path, file_type, category, columns,
+                              report_rows(iter_export_rows(sql, query_params), total, report_progress))
+            return {'path': path, 'download_name': f'{category}.{file_type}',
+                    'mimetype': 'text/csv' if file_type == 'csv' else XLSX_MIMETYPE, 'rows': total}
+
         cursor = conn.cursor()
+        incremental = params.get('mode') == 'changes'
+        until_event_id, _, item_ids, removals = plan_listing_export(cursor, exporter, category, params['ids'], incremental)
+        path = artifact_path(job_id, 'xlsx')
+        write_listing_workbook(path, cursor, exporter, category, item_ids, removals, progress=report_progress)
+        result = {'path': path, 'download_name': listing_download_name(exporter, incremental), 'mimetype': XLSX_MIMETYPE,
+                  'removals': len(removals) if removals is not None else None}
+        if params.get('checkpoint'):
+            # Saved by download_export: a link that is never used must not skip these changes
+            result['checkpoint'] = {'marketplace': exporter, 'category': category, 'event_id': until_event_id}
+        return result
+    finally:
+        conn.close()
 
-        # Check if this is a POST request with selected IDs
-        if request.method == 'POST':
-            data = request.json
-            item_ids = data.get('ids', [])
-            if not item_ids:
-                return jsonify({'error': 'No items selected'}), 400
-            
-            placeholders = ','.join('?' * len(item_ids))
-            cursor.execute(f'''
-                SELECT * FROM inventory 
-                WHERE id IN ({placeholders})
-                AND sold = "No" 
-                AND deleted_at IS NULL 
-                ORDER BY id
-            ''', item_ids)
+register_job_handler('export', run_export_job)
+
+@export_bp.route('/api/export/<job_id>', methods=['GET'])
+@login_required
+def export_status(job_id):
+    """Progress of a background export and, once it is done, its signed download link"""
+    job = get_job(job_id)
+    if job is None or job['kind'] != 'export':
+        return jsonify({'error': 'Export not found'}), 404
+    if job['user_id'] != current_user.id and not current_user.is_admin():
+        return jsonify({'error': 'Export not found'}), 404
+
+    progress = job['progress'] or {}
+    eta_seconds = None
+    fraction = progress.get('fraction')
+    if job['status'] == 'running' and job['started_at'] and fraction:
+        elapsed = time.time() - datetime.strptime(job['started_at'], '%Y-%m-%d %H:%M:%S').timestamp()
+        eta_seconds = round(elapsed * (1 - fraction) / fraction)
+
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'progress': progress,
+        'eta_seconds': eta_seconds,
+        'error': job['error']
+    }
+    if job['status'] == 'done':
+        if artifact_expired(job['result']['path']):
+            response['status'] = 'expired'
         else:
-            # Export everything (unsold only)
-            cursor.execute('''
-                SELECT * FROM inventory 
-                WHERE sold = "No" 
-                AND deleted_at IS NULL 
-                ORDER BY id
-            ''')
-        
-        items = cursor.fetchall()
-        conn.close()
+            response['download_name'] = job['result']['download_name']
+            response['download_url'] = url_for('export.download_export', token=sign_download(current_app.secret_key, job_id))
+            response['expires_at'] = (datetime.strptime(job['finished_at'], '%Y-%m-%d %H:%M:%S') +
+                                      timedelta(seconds=EXPORT_ARTIFACT_TTL_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    return jsonify(response)
+
+@export_bp.route('/export/download/<token>')
+def download_export(token):
+    """Download a background export; the signed token is the authorization"""
+    job_id = load_download(current_app.secret_key, token)
+    job = get_job(job_id) if job_id else None
+    if job is None or job['kind'] != 'export' or job['status'] != 'done':
+        return jsonify({'error': 'Invalid or expired download link'}), 404
+    result = job['result']
+    if artifact_expired(result['path']):
+        return jsonify({'error': 'This export has expired; please export again'}), 410
+    response = send_file(os.path.abspath(result['path']), mimetype=result['mimetype'], as_attachment=True,
+                         download_name=result['download_name'])
+    checkpoint = result.get('checkpoint')
+    if checkpoint:
+        conn = sqlite3.connect('inventory.db')
+        try:
+            save_checkpoint(conn.cursor(), checkpoint['marketplace'], checkpoint['category'], checkpoint['event_id'],
+                            job['user_id'])
+            conn.commit()
+        finally:
+            conn.close()
+    return response
 
-        # Prepare data for Squarespace format (same as Facebook but without location and category)
-        sq_data = []
-
-        for item in items:
-            # Map condition to standard values
-            condition = item[8] or ''
-            if condition.lower() in ['new', 'brand new']:
-                sq_condition = 'New'
-            elif condition.lower() in ['excellent', 'like new']:
-                sq_condition = 'Used - Like New'
-            elif condition.lower() in ['good', 'very good']:
-                sq_condition = 'Used - Good'
-            elif condition.lower() in ['fair', 'acceptable']:
-                sq_condition = 'Used - Fair'
-            else:
-                sq_condition = 'Used - Good'
-
-            # Build TITLE from Length, Year, Make, Type, VIN (max 150 chars)
-            title_parts = []
-            if item[1]:  # Length
-                title_parts.append(f"{int(item[1])}FT")
-            if item[2]:  # Year
-                title_parts.append(str(item[2]))
-            if item[3]:  # Make
-                title_parts.append(item[3].upper())
-            if item[4]:  # Type
-                title_parts.append(item[4].upper())
-
-            title = " ".join(title_parts)
-
-            # Add full VIN to title if available
-            if item[9]:  # VIN
-                if title:
-                    title += " - "
-                title += item[9]
-
-            # Truncate to 150 characters
-            title = title[:150]
-
-            # Build DESCRIPTION from Length x Width, Capacity, Description (NO LOCATION MESSAGE)
-            desc_parts = []
-            
-                        # Add Year, Make, Type first
-            if item[2]:  # Year
-                desc_parts.append(str(item[2]))
-            if item[3]:  # Make
-                desc_parts.append(item[3].upper())
-            if item[4]:  # Type
-                desc_parts.append(item[4].upper())
-                
-            # Add Length x Width format
-            if item[1] and item[5]:  # Length and Width
-                desc_parts.append(f"{int(item[1])}FT X {item[5]}IN")
-            elif item[1]:  # Length only
-                desc_parts.append(f"{int(item[1])}FT")
-            elif item[5]:  # Width only
-                desc_parts.append(f"{item[5]}IN")
-            
-            if item[6]:  # Capacity
-                desc_parts.append(item[6].upper())
-
-            description = ", ".join(desc_parts)
-
-            # Add main description
-            if item[7]:  # Description
-                if description:
-                    description += " - "
-                description += item[7].upper()
-
-            # Add LAST 7 of VIN to description
-            if item[9]:  # VIN
-                vin_short = item[9][-7:] if len(item[9]) >= 7 else item[9]
-                if description:
-                    description += " "
-                description += vin_short
-
-            # Add PRICE to description
-            price = float(item[12]) if item[12] else 0.0
-            if price > 0:
-                if description:
-                    description += " - "
-                description += f"${price:,.2f}"
-
-            # NO LOCATION MESSAGE FOR SQUARESPACE
-
-            # NO LOCATION MESSAGE FOR SQUARESPACE
-
-            # Truncate to 5000 characters
-            description = description[:5000]
-
-            # Get PRICE
-            price = float(item[12]) if item[12] else 0.0
-
-            # Add row to Squarespace data (NO CATEGORY COLUMN)
-            sq_data.append([title, price, sq_condition, description])
-
-        # Create Excel workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Squarespace Export"
-
-        # Row 1: Main title
-        ws.merge_cells('A1:D1')
-        cell_a1 = ws['A1']
-        cell_a1.value = "Squarespace Marketplace Export"
-        cell_a1.font = Font(bold=True, size=11)
-        cell_a1.alignment = Alignment(horizontal='left', vertical='center')
-
-        # Row 2: Instructions
-        ws.merge_cells('A2:D2')
-        cell_a2 = ws['A2']
-        cell_a2.value = "Export for Squarespace or other marketplaces. Save as XLS/XLSX file."
-        cell_a2.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-
-        # Row 3: Format requirements
-        format_requirements = [
-            'REQUIRED | Plain text (up to 150 characters)',
-            'REQUIRED | A whole number in $',
-            'REQUIRED | Condition',
-            'OPTIONAL | Plain text (up to 5000 characters)'
-        ]
-        for col_idx, req in enumerate(format_requirements, start=1):
-            cell = ws.cell(row=3, column=col_idx)
-            cell.value = req
-            cell.alignment = Alignment(wrap_text=True, vertical='top')
-
-        # Row 4: Column headers
-        headers = ['TITLE', 'PRICE', 'CONDITION', 'DESCRIPTION']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=4, column=col_idx)
-            cell.value = header
-            cell.font = Font(bold=True)
-
-        # Data rows starting from row 5
-        for row_idx, row_data in enumerate(sq_data, start=5):
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                # Format price column
-                if col_idx == 2:  # PRICE column
-                    cell.number_format = '$#,##0.00'
-
-        # Set column widths
-        ws.column_dimensions['A'].width = 50  # TITLE
-        ws.column_dimensions['B'].width = 12  # PRICE
-        ws.column_dimensions['C'].width = 20  # CONDITION
-        ws.column_dimensions['D'].width = 80  # DESCRIPTION
-
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='squarespace_export.xlsx'
-        )
+@export_bp.route('/export/facebook', methods=['GET', 'POST'])
+@login_required
+@view_required
+def export_facebook():
+    return export_listings('facebook')
 
-    except Exception as e:
-        logger.error(f"Error exporting to Squarespace format: {e}")
-        flash(f'Error exporting to Squarespace format: {str(e)}')
-        return redirect(url_for('index'))
\ No newline at end of file
+@export_bp.route('/export/squarespace', methods=['GET', 'POST'])
+@export_bp.route('/export/squarespace/<filter_type>')
+@login_required
+@view_required
+def export_squarespace(filter_type='all'):
+    return export_listings('squarespace')
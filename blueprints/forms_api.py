@@ -2,9 +2,14 @@ from flask import Blueprint, jsonify, request, session
 from flask_login import login_required, current_user
 import sqlite3
 import logging
+import json
 from datetime import datetime
 from functools import wraps
 from google_drive_service import get_drive_service, move_folder_to_archive, get_or_create_archive_folder
+from audit_log import record_event, fetch_rows, diff_fields
+from email_service import queue_new_item_alert
+from email_outbox import wake_outbox_worker
+from text_normalizer import normalize_fields
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +47,44 @@ def get_item(item_id):
         logger.error(f"Error getting item: {e}")
         return jsonify({'error': str(e)}), 500
 
+@forms_api_bp.route('/api/item/<int:item_id>/history', methods=['GET'])
+@login_required
+def get_item_history(item_id):
+    """Get the change history of an item from the events log"""
+    category = request.args.get('category', session.get('category', 'trailers'))
+    
+    try:
+        conn = sqlite3.connect('inventory.db')
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT e.id, e.timestamp, e.action, e.changes, u.username
+            FROM events e
+            LEFT JOIN users u ON e.user_id = u.id
+            WHERE e.item_id = ? AND e.category = ?
+            ORDER BY e.id DESC
+        ''', (item_id, category))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        # Hide cost fields from users without financial permission
+        hidden_fields = set() if current_user.has_financial_permission() else {'purchase_price', 'profit'}
+        
+        history = []
+        for row in rows:
+            changes = json.loads(row[3]) if row[3] else {}
+            history.append({
+                'id': row[0],
+                'timestamp': row[1],
+                'action': row[2],
+                'changes': {field: values for field, values in changes.items() if field not in hidden_fields},
+                'username': row[4]
+            })
+        
+        return jsonify(history)
+    except Exception as e:
+        logger.error(f"Error getting item history: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @forms_api_bp.route('/api/form-options/<category>', methods=['GET'])
 @login_required
 def get_form_options(category):
@@ -135,7 +178,7 @@ def add_item():
     table_name = 'inventory' if category == 'trailers' else category
     
     try:
-        data = request.json
+        data = normalize_fields(dict(request.json), category)
         conn = sqlite3.connect('inventory.db')
         cursor = conn.cursor()
         
@@ -246,19 +289,22 @@ def add_item():
                 data.get('google_drive_folder_id')
             ))
         
-        conn.commit()
         new_id = cursor.lastrowid
+        created = fetch_rows(cursor, table_name, [new_id]).get(new_id, {})
+        created.pop('id', None)
+        record_event(cursor, category, new_id, 'create', diff_fields({}, created))
+        # Delivered by the outbox worker once this commits
+        queue_new_item_alert(cursor, data)
+        conn.commit()
         conn.close()
-        
-        # Send email alert
-        try:
-            from email_service import send_new_item_alert
-            send_new_item_alert(data)
-        except Exception as e:
-            logger.error(f"Failed to send email alert: {e}")
+        wake_outbox_worker()
         
         return jsonify({'success': True, 'id': new_id}), 201
         
+    except sqlite3.IntegrityError:
+        # Unique VIN index; release the failed transaction's write lock
+        conn.close()
+        return jsonify({'error': 'Another item already has this VIN'}), 409
     except Exception as e:
         logger.error(f"Error adding item: {e}")
         return jsonify({'error': str(e)}), 500
@@ -272,15 +318,14 @@ def update_item(item_id):
     table_name = 'inventory' if category == 'trailers' else category
     
     try:
-        data = request.json
+        data = normalize_fields(dict(request.json), category)
         conn = sqlite3.connect('inventory.db')
         cursor = conn.cursor()
 
-        # Get current sold status and folder_id before updating
-        cursor.execute(f'SELECT sold, google_drive_folder_id FROM {table_name} WHERE id=?', (item_id,))
-        old_data = cursor.fetchone()
-        old_sold_status = old_data[0] if old_data else None
-        old_folder_id = old_data[1] if old_data else None
+        # Get current row (sold status and folder_id) before updating
+        old_row = fetch_rows(cursor, table_name, [item_id]).get(item_id)
+        old_sold_status = old_row['sold'] if old_row else None
+        old_folder_id = old_row['google_drive_folder_id'] if old_row else None
         
         if category == 'trailers':
             sell_price = float(data.get('sell_price', 0)) if data.get('sell_price') else None
@@ -389,10 +434,23 @@ def update_item(item_id):
                 item_id
             ))
         
+        new_sold_status = data.get('sold', 'No')
+
+        # Log what changed, in the same transaction as the update
+        if old_row:
+            changes = diff_fields(old_row, fetch_rows(cursor, table_name, [item_id]).get(item_id, {}))
+            if (old_sold_status or '').upper() != 'YES' and (new_sold_status or '').upper() == 'YES':
+                action = 'sold'
+            elif (old_sold_status or '').upper() == 'YES' and (new_sold_status or '').upper() != 'YES':
+                action = 'unsold'
+            else:
+                action = 'update'
+            if changes:
+                record_event(cursor, category, item_id, action, changes)
+
         conn.commit()
        
         # If item was marked as sold and has a Drive folder, move it to archive
-        new_sold_status = data.get('sold', 'No')
         
         # Debug output
         # print(f"=== ARCHIVE CHECK ===")
@@ -426,6 +484,10 @@ def update_item(item_id):
         
         return jsonify({'success': True})
         
+    except sqlite3.IntegrityError:
+        # Unique VIN index; release the failed transaction's write lock
+        conn.close()
+        return jsonify({'error': 'Another item already has this VIN'}), 409
     except Exception as e:
         logger.error(f"Error updating item: {e}")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -2,6 +2,9 @@ from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 import sqlite3
 import logging
+from audit_log import TABLE_CATEGORIES, record_event, record_events, fetch_rows, bulk_update_events
+from email_service import queue_item_sold_alerts
+from email_outbox import wake_outbox_worker
 
 logger = logging.getLogger(__name__)
 
@@ -102,6 +105,9 @@ def delete_item(item_id):
         cursor = conn.cursor()
         # Soft delete - mark as deleted
         cursor.execute(f'UPDATE {table_name} SET deleted_at = datetime("now") WHERE id = ?', (item_id,))
+        # No such item: nothing changed, so nothing to log
+        if cursor.rowcount == 1:
+            record_event(cursor, TABLE_CATEGORIES[table_name], item_id, 'delete')
         conn.commit()
         conn.close()
         
@@ -126,8 +132,10 @@ def bulk_delete():
         cursor = conn.cursor()
         
         placeholders = ','.join('?' * len(item_ids))
+        before_rows = fetch_rows(cursor, table_name, item_ids)
         # Soft delete - mark as deleted
         cursor.execute(f'UPDATE {table_name} SET deleted_at = datetime("now") WHERE id IN ({placeholders})', item_ids)
+        record_events(cursor, bulk_update_events(TABLE_CATEGORIES[table_name], item_ids, 'delete', before_rows, {}))
         
         conn.commit()
         conn.close()
@@ -150,10 +158,10 @@ def bulk_mark_sold():
         conn, table_name = get_db_connection(category)
         cursor = conn.cursor()
         
-        # Get folder IDs before updating (for archive)
+        # Get current rows before updating (folder IDs for archive, old values for the event log)
         placeholders = ','.join('?' * len(item_ids))
-        cursor.execute(f'SELECT id, google_drive_folder_id FROM {table_name} WHERE id IN ({placeholders})', item_ids)
-        items_with_folders = cursor.fetchall()
+        before_rows = fetch_rows(cursor, table_name, item_ids)
+        items_with_folders = [(row['id'], row['google_drive_folder_id']) for row in before_rows.values()]
         
         # Update items to sold
         cursor.execute(f'''
@@ -161,8 +169,13 @@ def bulk_mark_sold():
             SET sold = "YES", sold_date = ? 
             WHERE id IN ({placeholders})
         ''', [sold_date] + item_ids)
+        record_events(cursor, bulk_update_events(TABLE_CATEGORIES[table_name], item_ids, 'sold', before_rows,
+                                                 {'sold': 'YES', 'sold_date': sold_date}))
+        # One sold alert (a digest for several units) goes out through the outbox, committed with the sale
+        queue_item_sold_alerts(cursor, [dict(row, sold='YES', sold_date=sold_date) for row in before_rows.values()])
         
         conn.commit()
+        wake_outbox_worker()
         
         # Move folders to archive
         from google_drive_service import get_drive_service, move_folder_to_archive, get_or_create_archive_folder
@@ -178,16 +191,6 @@ def bulk_mark_sold():
         except Exception as e:
             logger.error(f"Error moving folders to archive: {e}")
         
-        # Send email notifications for each sold item
-        for item_id in item_ids:
-            cursor.execute(f'SELECT * FROM {table_name} WHERE id = ?', (item_id,))
-            columns = [description[0] for description in cursor.description]
-            row = cursor.fetchone()
-            if row:
-                item_data = dict(zip(columns, row))
-                from email_service import send_item_sold_alert
-                send_item_sold_alert(item_data)
-        
         conn.close()
         
         return jsonify({'success': True, 'updated': len(item_ids)})
@@ -216,7 +219,10 @@ def bulk_mark_unsold():
         # print(f"Query: {query}")
         # print(f"Values: {item_ids}")
         
+        before_rows = fetch_rows(cursor, table_name, item_ids)
         cursor.execute(f'UPDATE {table_name} SET sold = "No", sold_date = NULL WHERE id IN ({placeholders})', item_ids)
+        record_events(cursor, bulk_update_events(TABLE_CATEGORIES[table_name], item_ids, 'unsold', before_rows,
+                                                 {'sold': 'No', 'sold_date': None}))
         # rows_affected = cursor.rowcount
         # print(f"Rows affected: {rows_affected}")
         
@@ -279,7 +285,14 @@ def bulk_edit():
             WHERE id IN ({placeholders})
         '''
         
+        before_rows = fetch_rows(cursor, table_name, item_ids)
         cursor.execute(query, values)
+        applied = {field: updates[field] for field in ['sold', 'sold_date', 'pictures_taken', 'facebook_posted_date'] if field in updates}
+        # A sale (or undoing one) is logged as such, so reports and exports see it like the mark-sold routes
+        action = 'bulk_edit'
+        if 'sold' in updates:
+            action = 'sold' if str(updates['sold']).upper() == 'YES' else 'unsold'
+        record_events(cursor, bulk_update_events(TABLE_CATEGORIES[table_name], item_ids, action, before_rows, applied))
         conn.commit()
         conn.close()
         
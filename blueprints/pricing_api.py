@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
+import logging
+from functools import wraps
+from pricing_service import suggest_price
+
+logger = logging.getLogger(__name__)
+
+pricing_api_bp = Blueprint('pricing_api', __name__)
+
+def edit_required(f):
+    """Decorator to check edit permissions"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.has_edit_permission():
+            return jsonify({'error': 'Edit permission required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+@pricing_api_bp.route('/api/pricing/suggest', methods=['GET'])
+@login_required
+@edit_required
+def pricing_suggest():
+    """Suggest a sell price for a trailer from the most similar sold units"""
+    try:
+        k = min(max(request.args.get('k', 5, type=int), 1), 25)
+        suggestion = suggest_price(
+            length=request.args.get('length'),
+            year=request.args.get('year'),
+            make=request.args.get('make'),
+            type=request.args.get('type'),
+            capacity=request.args.get('capacity'),
+            hitch_type=request.args.get('hitch_type'),
+            k=k
+        )
+        return jsonify(suggestion)
+    except Exception as e:
+        logger.error(f"Error suggesting price: {e}")
+        return jsonify({'error': str(e)}), 500
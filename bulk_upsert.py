@@ -0,0 +1,160 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+VIN_TABLES = ['inventory', 'trucks', 'classic_cars']
+
+# SQLite's default bound-parameter limit is 999
+SQL_CHUNK_SIZE = 900
+# Rows per executemany; every chunk runs in the caller's transaction
+UPSERT_CHUNK_SIZE = 500
+
+# Blank VINs are allowed to repeat, so the unique index only covers real ones
+VIN_INDEX_WHERE = "vin IS NOT NULL AND vin != ''"
+
+def vin_index_name(table_name):
+    return f'idx_{table_name}_vin_unique'
+
+def init_vin_indexes():
+    """
+    Create a partial unique VIN index on each item table. A table that already holds
+    duplicate VINs is left without one and bulk writes fall back to separate
+    UPDATE/INSERT batches until the duplicates are cleaned up.
+    """
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    for table_name in VIN_TABLES:
+        try:
+            cursor.execute(f'''
+                CREATE UNIQUE INDEX IF NOT EXISTS {vin_index_name(table_name)}
+                ON {table_name} (vin) WHERE {VIN_INDEX_WHERE}
+            ''')
+        except sqlite3.IntegrityError:
+            logger.warning(f"{table_name} has duplicate VINs; bulk upserts will use the slower UPDATE/INSERT path")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not create VIN index on {table_name}: {e}")
+    conn.commit()
+    conn.close()
+
+def has_vin_index(cursor, table_name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (vin_index_name(table_name),))
+    return cursor.fetchone() is not None
+
+def find_ids_by_vin(cursor, table_name, vins):
+    """Map VIN -> id for VINs already in the table (lowest id wins), in chunked IN queries"""
+    existing = {}
+    vins = list(vins)
+    for start in range(0, len(vins), SQL_CHUNK_SIZE):
+        chunk = vins[start:start + SQL_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        # Repeating the partial index condition lets SQLite use the VIN index
+        cursor.execute(f'SELECT id, vin FROM {table_name} WHERE vin IN ({placeholders}) AND {VIN_INDEX_WHERE} ORDER BY id', chunk)
+        for item_id, vin in cursor.fetchall():
+            existing.setdefault(vin, item_id)
+    return existing
+
+def fetch_rows_by_id(cursor, table_name, item_ids):
+    """Return {id: row dict} for the given ids, in chunked IN queries"""
+    rows = {}
+    item_ids = list(item_ids)
+    for start in range(0, len(item_ids), SQL_CHUNK_SIZE):
+        chunk = item_ids[start:start + SQL_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'SELECT * FROM {table_name} WHERE id IN ({placeholders})', chunk)
+        columns = [description[0] for description in cursor.description]
+        rows.update({row[0]: dict(zip(columns, row)) for row in cursor.fetchall()})
+    return rows
+
+def bulk_upsert(cursor, table_name, columns, records, insert_only=None, with_before=False):
+    """
+    Insert or update rows keyed by VIN.
+
+    columns     - column names matching each record tuple; must include 'vin'
+    records     - iterable of tuples
+    insert_only - {column: value} set on new rows only (e.g. date_added)
+    with_before - also return the pre-update row for every updated id
+
+    Runs in the caller's transaction; the caller commits. Rows with a blank VIN are
+    skipped, and when a VIN appears more than once the last record wins. Returns
+    {'inserted', 'updated', 'skipped', 'ids': {vin: id}, 'before': {id: row}}.
+    """
+    insert_only = insert_only or {}
+    vin_position = columns.index('vin')
+
+    by_vin = {}
+    skipped = 0
+    for record in records:
+        vin = record[vin_position]
+        if vin is None or str(vin).strip() == '':
+            skipped += 1
+            continue
+        if vin in by_vin:
+            skipped += 1
+        by_vin[vin] = record
+
+    result = {'inserted': 0, 'updated': 0, 'skipped': skipped, 'ids': {}, 'before': {}}
+    rows = list(by_vin.values())
+    if not rows:
+        return result
+
+    use_upsert = has_vin_index(cursor, table_name)
+    insert_columns = list(columns) + list(insert_only)
+    insert_values = tuple(insert_only.values())
+    update_columns = [column for column in columns if column != 'vin']
+
+    insert_sql = f'''
+        INSERT INTO {table_name} ({', '.join(insert_columns)})
+        VALUES ({', '.join('?' * len(insert_columns))})
+    '''
+    upsert_sql = insert_sql + f'''
+        ON CONFLICT (vin) WHERE {VIN_INDEX_WHERE}
+        DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in update_columns)}
+    '''
+    update_sql = f'''
+        UPDATE {table_name} SET {', '.join(f'{column} = ?' for column in update_columns)}
+        WHERE id = ?
+    '''
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+        # Knowing which VINs exist up front is what makes the inserted/updated split exact
+        existing = find_ids_by_vin(cursor, table_name, [record[vin_position] for record in chunk])
+        if with_before:
+            result['before'].update(fetch_rows_by_id(cursor, table_name, existing.values()))
+
+        new_rows = [record for record in chunk if record[vin_position] not in existing]
+        if use_upsert:
+            cursor.executemany(upsert_sql, [record + insert_values for record in chunk])
+        else:
+            cursor.executemany(update_sql, [
+                tuple(value for i, value in enumerate(record) if i != vin_position) + (existing[record[vin_position]],)
+                for record in chunk if record[vin_position] in existing
+            ])
+            cursor.executemany(insert_sql, [record + insert_values for record in new_rows])
+
+        result['updated'] += len(chunk) - len(new_rows)
+        result['inserted'] += len(new_rows)
+        result['ids'].update(existing)
+        if new_rows:
+            result['ids'].update(find_ids_by_vin(cursor, table_name, [record[vin_position] for record in new_rows]))
+
+    return result
+
+def bulk_update_by_vin(cursor, table_name, columns, records, where=None):
+    """
+    Update existing rows only, matched by VIN; records are tuples of (vin, *values for columns).
+    `where` adds an extra SQL condition (e.g. only rows missing a value). Runs in the
+    caller's transaction. Returns the number of rows changed.
+    """
+    sql = f'''
+        UPDATE {table_name} SET {', '.join(f'{column} = ?' for column in columns)}
+        WHERE vin = ? AND {VIN_INDEX_WHERE}{f' AND ({where})' if where else ''}
+    '''
+    changed = 0
+    records = list(records)
+    for start in range(0, len(records), UPSERT_CHUNK_SIZE):
+        chunk = records[start:start + UPSERT_CHUNK_SIZE]
+        cursor.executemany(sql, [tuple(record[1:]) + (record[0],) for record in chunk])
+        changed += cursor.rowcount
+    return changed
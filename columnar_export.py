@@ -0,0 +1,126 @@
+"""
+Typed columnar exports (Parquet, Arrow IPC) for analytics.
+
+Unlike CSV, every column keeps a real type: INTEGER/REAL columns become int64 and
+float64, YES/NO flags booleans, and the date columns dates or timestamps, whatever
+format they were typed in. Rows are read page by page (export_pipeline) and written
+as record batches, so memory stays bounded by the batch size.
+
+pyarrow is optional: without it these exports raise RuntimeError and everything
+else works as before.
+"""
+
+import os
+import logging
+from datetime import datetime
+from itertools import islice
+from export_pipeline import iter_export_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+# Rows per record batch (and Parquet row group)
+COLUMNAR_BATCH_SIZE = int(os.environ.get('COLUMNAR_BATCH_SIZE', 50000))
+
+# Columns stored as text that hold something more specific
+BOOLEAN_COLUMNS = {'sold', 'pictures_taken'}
+DATE_COLUMNS = {'sold_date', 'date_added', 'facebook_posted_date'}
+TIMESTAMP_COLUMNS = {'created_at', 'deleted_at'}
+
+# Formats dates have been entered in, most common first
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S.%f',
+                '%m/%d/%Y', '%m/%d/%y', '%m-%d-%Y', '%Y/%m/%d')
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError('Parquet and Arrow exports need pyarrow (pip install pyarrow)')
+
+def parse_datetime(value):
+    """datetime from a date in any of DATE_FORMATS, or None"""
+    if value is None or value == '':
+        return None
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _to_bool(value):
+    if value is None or value == '':
+        return None
+    return str(value).strip().lower() in ('yes', 'y', 'true', '1')
+
+def _to_int(value):
+    try:
+        return int(float(value)) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_date(value):
+    parsed = parse_datetime(value)
+    return parsed.date() if parsed else None
+
+def _to_text(value):
+    return None if value is None else str(value)
+
+def column_types(conn, table_name, columns):
+    """[(arrow type, converter)] for the export columns, from their names and declared types"""
+    require_pyarrow()
+    declared = {row[1]: (row[2] or '').upper() for row in conn.execute(f'PRAGMA table_info({table_name})').fetchall()}
+    types = []
+    for column in columns:
+        if column in BOOLEAN_COLUMNS:
+            types.append((pa.bool_(), _to_bool))
+        elif column in DATE_COLUMNS:
+            types.append((pa.date32(), _to_date))
+        elif column in TIMESTAMP_COLUMNS:
+            types.append((pa.timestamp('s'), parse_datetime))
+        elif 'INT' in declared.get(column, ''):
+            types.append((pa.int64(), _to_int))
+        elif declared.get(column, '') in ('REAL', 'FLOAT', 'DOUBLE', 'NUMERIC'):
+            types.append((pa.float64(), _to_float))
+        else:
+            types.append((pa.string(), _to_text))
+    return types
+
+def iter_record_batches(sql, params, schema, types, batch_size=COLUMNAR_BATCH_SIZE):
+    """Yield record batches of the export rows, converted to the schema's types"""
+    rows = iter_export_rows(sql, params)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        arrays = [pa.array([convert(value) for value in values], type=arrow_type)
+                  for values, (arrow_type, convert) in zip(zip(*batch), types)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_columnar(path, file_format, sql, params, columns, types):
+    """Write the export rows to path as Parquet or an Arrow IPC file"""
+    require_pyarrow()
+    schema = pa.schema([(column, arrow_type) for column, (arrow_type, _) in zip(columns, types)])
+    if file_format == 'parquet':
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for batch in iter_record_batches(sql, params, schema, types):
+                writer.write_batch(batch)
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in iter_record_batches(sql, params, schema, types):
+                writer.write_batch(batch)
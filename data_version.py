@@ -0,0 +1,44 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Inventory tables whose writes bump the data version
+TRACKED_TABLES = ['inventory', 'trucks', 'classic_cars']
+
+def init_data_version():
+    """
+    Create the data_versions table plus AFTER INSERT/UPDATE/DELETE triggers on each
+    inventory table. Every write (routes, imports, maintenance scripts) bumps the
+    table's counter, so caches can cheaply tell whether their snapshot is stale.
+    """
+    try:
+        conn = sqlite3.connect('inventory.db')
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        for table in TRACKED_TABLES:
+            cursor.execute('INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)', (table,))
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_data_version
+                    AFTER {operation} ON {table}
+                    BEGIN
+                        UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+                    END
+                ''')
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error initializing data versions: {e}")
+        raise
+
+def get_data_version(cursor, table_name):
+    """Return the current write counter for a table (0 if untracked)"""
+    cursor.execute('SELECT version FROM data_versions WHERE table_name = ?', (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
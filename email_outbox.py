@@ -0,0 +1,332 @@
+"""
+Durable outbox for email alerts.
+
+Request handlers don't talk to the mail server. queue_email() inserts the message
+into email_outbox with the caller's cursor, so it commits (or rolls back) with the
+change it is about, and a background worker delivers it. A failed send is retried
+with exponential backoff; after EMAIL_MAX_ATTEMPTS it is left as 'dead' for an
+admin to look at and retry.
+
+Statuses: pending -> sending -> sent, or back to pending (retry) or dead.
+
+Alerts can also be coalesced: hold_for_digest() keeps an alert's item instead of
+a message, and once the oldest held item of a kind has waited
+EMAIL_DIGEST_WINDOW_SECONDS the worker turns all of them into one message with
+the builder registered for that kind.
+"""
+
+import os
+import json
+import time
+import smtplib
+import sqlite3
+import threading
+import multiprocessing
+import logging
+from datetime import datetime
+from flask_mail import Message
+
+logger = logging.getLogger(__name__)
+
+# Attempts before a message is dead-lettered
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+# Delay before the first retry; doubles with each failure up to EMAIL_RETRY_MAX_SECONDS
+EMAIL_RETRY_BASE_SECONDS = float(os.environ.get('EMAIL_RETRY_BASE_SECONDS', 30))
+EMAIL_RETRY_MAX_SECONDS = float(os.environ.get('EMAIL_RETRY_MAX_SECONDS', 3600))
+# Seconds the worker sleeps between checks when nothing wakes it
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', 10))
+# Messages claimed per pass
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+# Messages sent over one SMTP connection before it is closed and a new one opened
+EMAIL_MAX_PER_CONNECTION = int(os.environ.get('EMAIL_MAX_PER_CONNECTION', 50))
+# A message left 'sending' this long belonged to a worker that died mid-send
+EMAIL_SENDING_STALE_SECONDS = 600
+# Alerts are held this long and sent as one digest per kind; 0 sends each one as it happens
+EMAIL_DIGEST_WINDOW_SECONDS = float(os.environ.get('EMAIL_DIGEST_WINDOW_SECONDS', 0))
+
+_digest_builders = {}
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+def init_email_outbox_table():
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            recipients TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_digest_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_digest_items_kind ON email_digest_items (kind, created_at)')
+    conn.commit()
+    conn.close()
+
+def queue_email(cursor, kind, recipients, subject, html):
+    """
+    Add a message to the outbox in the caller's transaction; it is only delivered
+    once the caller commits. Call wake_outbox_worker() after the commit.
+    """
+    cursor.execute('''
+        INSERT INTO email_outbox (kind, recipients, subject, html, status, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, 'pending', ?, ?)
+    ''', (kind, json.dumps(list(recipients)), subject, html, time.time(),
+          datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return cursor.lastrowid
+
+def wake_outbox_worker():
+    """Have the worker look at the outbox now rather than at its next poll"""
+    _wake.set()
+
+def register_digest(kind, build):
+    """build(items) -> (recipients, subject, html), or None to send nothing, for held items of a kind"""
+    _digest_builders[kind] = build
+
+def hold_for_digest(cursor, kind, item):
+    """Hold an alert's item in the caller's transaction, to go out in the next digest of its kind"""
+    cursor.execute('''
+        INSERT INTO email_digest_items (kind, payload, created_at) VALUES (?, ?, ?)
+    ''', (kind, json.dumps(item, default=str), time.time()))
+
+def flush_due_digests(window=None):
+    """
+    Queue one message per kind whose oldest held item has waited a full window,
+    covering every item of that kind held so far. Returns how many were queued.
+    """
+    window = EMAIL_DIGEST_WINDOW_SECONDS if window is None else window
+    queued = 0
+    conn = sqlite3.connect('inventory.db', timeout=10, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.cursor()
+        for kind, build in _digest_builders.items():
+            oldest = cursor.execute('SELECT MIN(created_at) FROM email_digest_items WHERE kind = ?', (kind,)).fetchone()[0]
+            if oldest is None or oldest > time.time() - window:
+                continue
+            rows = cursor.execute('SELECT id, payload FROM email_digest_items WHERE kind = ? ORDER BY id', (kind,)).fetchall()
+            cursor.execute('DELETE FROM email_digest_items WHERE kind = ? AND id <= ?', (kind, rows[-1][0]))
+            message = build([json.loads(payload) for _, payload in rows])
+            if message:
+                queue_email(cursor, f'{kind}_digest', *message)
+                queued += 1
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return queued
+
+def retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts"""
+    return min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+
+def claim_due_emails(limit=EMAIL_OUTBOX_BATCH_SIZE):
+    """Atomically move due pending messages to sending; returns [(id, recipients, subject, html, attempts)]"""
+    now = time.time()
+    conn = sqlite3.connect('inventory.db', timeout=10, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('''
+            UPDATE email_outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?
+        ''', (now - EMAIL_SENDING_STALE_SECONDS,))
+        rows = conn.execute('''
+            SELECT id, recipients, subject, html, attempts FROM email_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at LIMIT ?
+        ''', (now, limit)).fetchall()
+        if rows:
+            conn.execute(f'''
+                UPDATE email_outbox SET status = 'sending', claimed_at = ?
+                WHERE id IN ({','.join('?' * len(rows))})
+            ''', [now] + [row[0] for row in rows])
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return [(row[0], json.loads(row[1]), row[2], row[3], row[4]) for row in rows]
+
+def mark_sent(email_id):
+    _update_email(email_id, "status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL",
+                  (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+
+def mark_failed(email_id, attempts, error):
+    """Schedule a retry with backoff, or dead-letter the message after the last attempt"""
+    attempts += 1
+    if attempts >= EMAIL_MAX_ATTEMPTS:
+        logger.error(f"Email {email_id} dead after {attempts} attempts: {error}")
+        _update_email(email_id, "status = 'dead', attempts = ?, last_error = ?", (attempts, error))
+    else:
+        _update_email(email_id, "status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?",
+                      (attempts, error, time.time() + retry_delay(attempts)))
+
+def _update_email(email_id, assignments, values):
+    conn = sqlite3.connect('inventory.db', timeout=10)
+    conn.execute(f'UPDATE email_outbox SET {assignments} WHERE id = ?', tuple(values) + (email_id,))
+    conn.commit()
+    conn.close()
+
+def retry_email(email_id):
+    """Put a dead (or failed) message back in the queue for immediate delivery; False if it was sent or unknown"""
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?
+        WHERE id = ? AND status IN ('dead', 'pending')
+    ''', (time.time(), email_id))
+    retried = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    if retried:
+        wake_outbox_worker()
+    return retried
+
+def list_outbox(status=None, limit=100):
+    """Most recent outbox messages (without the body), optionally of one status"""
+    conn = sqlite3.connect('inventory.db')
+    conn.row_factory = sqlite3.Row
+    where, params = ('WHERE status = ?', (status,)) if status else ('', ())
+    rows = conn.execute(f'''
+        SELECT id, kind, recipients, subject, status, attempts, last_error, created_at, sent_at, next_attempt_at
+        FROM email_outbox {where} ORDER BY id DESC LIMIT ?
+    ''', params + (limit,)).fetchall()
+    conn.close()
+    return [dict(row, recipients=json.loads(row['recipients'])) for row in rows]
+
+class MailConnectError(Exception):
+    """The mail server could not be reached or refused the login"""
+
+def _connection_lost(error):
+    """True when a send failed because the server dropped the connection, not because of the message"""
+    return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)) or \
+        getattr(error, 'smtp_code', None) == 421
+
+class MailSession:
+    """
+    One authenticated SMTP connection (Flask-Mail's mail.connect()) reused for a
+    batch of messages, instead of a connect, TLS handshake and login per message.
+    It is replaced after max_messages, and when the server drops it a message is
+    retried once on a fresh connection. Use as a context manager.
+    """
+
+    def __init__(self, mail, max_messages=EMAIL_MAX_PER_CONNECTION):
+        self.mail = mail
+        self.max_messages = max_messages
+        self.connection = None
+        self.sent_on_connection = 0
+        self.connections_opened = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _connect(self):
+        try:
+            self.connection = self.mail.connect().__enter__()
+        except Exception as e:
+            raise MailConnectError(str(e)) from e
+        self.sent_on_connection = 0
+        self.connections_opened += 1
+
+    def close(self, broken=False):
+        if self.connection is None:
+            return
+        host, self.connection = self.connection.host, None
+        if host is None:
+            return
+        try:
+            # A dropped connection can't say QUIT
+            host.close() if broken else host.quit()
+        except Exception:
+            host.close()
+
+    def send(self, message):
+        reused = self.connection is not None
+        if not reused:
+            self._connect()
+        try:
+            self.connection.send(message)
+        except Exception as e:
+            if not _connection_lost(e):
+                raise
+            self.close(broken=True)
+            if not reused:
+                raise
+            # The kept-open connection went stale (server timeout, restart): once more on a new one
+            self._connect()
+            self.connection.send(message)
+        self.sent_on_connection += 1
+        if self.sent_on_connection >= self.max_messages:
+            self.close()
+
+def deliver_due_emails(mail):
+    """
+    One worker pass: send every due message through Flask-Mail over a shared
+    connection; returns how many were claimed
+    """
+    emails = claim_due_emails()
+    with MailSession(mail) as session:
+        for index, (email_id, recipients, subject, html, attempts) in enumerate(emails):
+            try:
+                session.send(Message(subject=subject, recipients=recipients, html=html))
+                mark_sent(email_id)
+            except MailConnectError as e:
+                # Server unreachable: the rest of the batch backs off with this one
+                logger.warning(f"Could not connect to the mail server: {e}")
+                for pending_id, _, _, _, pending_attempts in emails[index:]:
+                    mark_failed(pending_id, pending_attempts, str(e))
+                break
+            except Exception as e:
+                logger.warning(f"Email {email_id} attempt {attempts + 1} failed: {e}")
+                mark_failed(email_id, attempts, str(e))
+    return len(emails)
+
+def _worker_loop(app, mail):
+    while True:
+        try:
+            # Flask-Mail reads the server settings from the app config
+            with app.app_context():
+                if _digest_builders:
+                    flush_due_digests()
+                delivered = deliver_due_emails(mail)
+        except Exception as e:
+            logger.error(f"Error delivering queued email: {e}")
+            delivered = 0
+        if delivered:
+            continue
+        _wake.wait(EMAIL_OUTBOX_POLL_SECONDS)
+        _wake.clear()
+
+def start_outbox_worker(app, mail):
+    """Start this process's delivery thread (once); messages left from a restart are picked up"""
+    global _worker
+    if multiprocessing.parent_process() is not None:
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, args=(app, mail), name='email-outbox', daemon=True)
+            _worker.start()
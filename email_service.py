@@ -1,6 +1,7 @@
-from flask_mail import Mail, Message
+from flask_mail import Mail
 from flask import current_app, render_template_string
 import os
+from email_outbox import queue_email, register_digest, hold_for_digest, EMAIL_DIGEST_WINDOW_SECONDS
 
 mail = Mail()
 
@@ -81,219 +82,320 @@ def get_sold_item_recipients():
         current_app.logger.error(f"Error getting sold item recipients: {e}")
         return []
 
-def send_new_item_alert(item_data):
-    """Send email alert when new inventory item is added"""
-    recipients = get_new_item_recipients()  # CHANGED THIS LINE
-    if not recipients:
-        current_app.logger.warning("No alert recipients configured")
-        return False
+def new_item_alert_message(item_data):
+    """(subject, html) of the alert for a new inventory item"""
+    subject = f"New Inventory Added: {item_data.get('year', '')} {item_data.get('make', '')} {item_data.get('type', '')}"
     
-    # ... rest stays exactly the same ...
-    try:
-        subject = f"New Inventory Added: {item_data.get('year', '')} {item_data.get('make', '')} {item_data.get('type', '')}"
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #dee2e6; border-radius: 0 0 8px 8px; }}
-                .item-details {{ background: white; padding: 15px; border-radius: 8px; margin-top: 15px; }}
-                .detail-row {{ display: flex; padding: 8px 0; border-bottom: 1px solid #f0f0f0; }}
-                .detail-label {{ font-weight: bold; width: 150px; color: #555; }}
-                .detail-value {{ flex: 1; color: #333; }}
-                .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2 style="margin: 0;">🚛 New Inventory Alert</h2>
-                    <p style="margin: 5px 0 0 0;">A new item has been added to your inventory</p>
-                </div>
-                <div class="content">
-                    <div class="item-details">
-                        <div class="detail-row">
-                            <span class="detail-label">Length:</span>
-                            <span class="detail-value">{item_data.get('length', 'N/A')} FT</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Year:</span>
-                            <span class="detail-value">{item_data.get('year', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Make:</span>
-                            <span class="detail-value">{item_data.get('make', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Type:</span>
-                            <span class="detail-value">{item_data.get('type', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Hitch Type:</span>
-                            <span class="detail-value">{item_data.get('hitch_type', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Dimensions:</span>
-                            <span class="detail-value">{item_data.get('dimensions', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Capacity:</span>
-                            <span class="detail-value">{item_data.get('capacity', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Description:</span>
-                            <span class="detail-value">{item_data.get('description', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Condition:</span>
-                            <span class="detail-value">{item_data.get('condition', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">VIN:</span>
-                            <span class="detail-value">{item_data.get('vin', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Color:</span>
-                            <span class="detail-value">{item_data.get('color', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Purchase Price:</span>
-                            <span class="detail-value">${item_data.get('purchase_price', '0')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Sell Price:</span>
-                            <span class="detail-value">${item_data.get('sell_price', '0')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Expected Profit:</span>
-                            <span class="detail-value">${item_data.get('profit', '0')}</span>
-                        </div>
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
+            .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #dee2e6; border-radius: 0 0 8px 8px; }}
+            .item-details {{ background: white; padding: 15px; border-radius: 8px; margin-top: 15px; }}
+            .detail-row {{ display: flex; padding: 8px 0; border-bottom: 1px solid #f0f0f0; }}
+            .detail-label {{ font-weight: bold; width: 150px; color: #555; }}
+            .detail-value {{ flex: 1; color: #333; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2 style="margin: 0;">🚛 New Inventory Alert</h2>
+                <p style="margin: 5px 0 0 0;">A new item has been added to your inventory</p>
+            </div>
+            <div class="content">
+                <div class="item-details">
+                    <div class="detail-row">
+                        <span class="detail-label">Length:</span>
+                        <span class="detail-value">{item_data.get('length', 'N/A')} FT</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Year:</span>
+                        <span class="detail-value">{item_data.get('year', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Make:</span>
+                        <span class="detail-value">{item_data.get('make', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Type:</span>
+                        <span class="detail-value">{item_data.get('type', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Hitch Type:</span>
+                        <span class="detail-value">{item_data.get('hitch_type', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Dimensions:</span>
+                        <span class="detail-value">{item_data.get('dimensions', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Capacity:</span>
+                        <span class="detail-value">{item_data.get('capacity', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Description:</span>
+                        <span class="detail-value">{item_data.get('description', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Condition:</span>
+                        <span class="detail-value">{item_data.get('condition', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">VIN:</span>
+                        <span class="detail-value">{item_data.get('vin', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Color:</span>
+                        <span class="detail-value">{item_data.get('color', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Purchase Price:</span>
+                        <span class="detail-value">${item_data.get('purchase_price', '0')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Sell Price:</span>
+                        <span class="detail-value">${item_data.get('sell_price', '0')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Expected Profit:</span>
+                        <span class="detail-value">${item_data.get('profit', '0')}</span>
                     </div>
-                </div>
-                <div class="footer">
-                    <p>Goodnight Trailers Inventory Management System</p>
                 </div>
             </div>
-        </body>
-        </html>
-        """
-        
-        msg = Message(
-            subject=subject,
-            recipients=recipients,
-            html=html_body
-        )
-        
-        mail.send(msg)
-        current_app.logger.info(f"New item alert sent to {recipients}")
-        return True
-        
-    except Exception as e:
-        current_app.logger.error(f"Failed to send new item alert: {str(e)}")
-        return False
+            <div class="footer">
+                <p>Goodnight Trailers Inventory Management System</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return subject, html_body
 
-def send_item_sold_alert(item_data):
-    """Send email alert when item is marked as sold"""
-    current_app.logger.info(f"=== SOLD ALERT CALLED === Item data: {item_data}")
-    recipients = get_sold_item_recipients()
-    current_app.logger.info(f"Sold item recipients found: {recipients}")
-    if not recipients:
-        current_app.logger.warning("No alert recipients configured")
-        return False
+def item_sold_alert_message(item_data):
+    """(subject, html) of the alert for an item marked as sold"""
+    subject = f"Item SOLD: {item_data.get('year', '')} {item_data.get('make', '')} {item_data.get('type', '')}"
     
-    # ... rest stays exactly the same ...
-    try:
-        subject = f"Item SOLD: {item_data.get('year', '')} {item_data.get('make', '')} {item_data.get('type', '')}"
-        
-        purchase_price = float(item_data.get('purchase_price', 0) or 0)
-        sell_price = float(item_data.get('sell_price', 0) or 0)
-        profit = sell_price - purchase_price
-        profit_color = 'green' if profit >= 0 else 'red'
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #28a745 0%, #20c997 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #dee2e6; border-radius: 0 0 8px 8px; }}
-                .item-details {{ background: white; padding: 15px; border-radius: 8px; margin-top: 15px; }}
-                .detail-row {{ display: flex; padding: 8px 0; border-bottom: 1px solid #f0f0f0; }}
-                .detail-label {{ font-weight: bold; width: 150px; color: #555; }}
-                .detail-value {{ flex: 1; color: #333; }}
-                .profit-highlight {{ background: {profit_color}; color: white; padding: 10px; border-radius: 8px; text-align: center; font-size: 18px; font-weight: bold; margin-top: 15px; }}
-                .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2 style="margin: 0;">✅ Item Sold!</h2>
-                    <p style="margin: 5px 0 0 0;">An item has been marked as sold</p>
-                </div>
-                <div class="content">
-                    <div class="item-details">
-                        <div class="detail-row">
-                            <span class="detail-label">Year:</span>
-                            <span class="detail-value">{item_data.get('year', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Make:</span>
-                            <span class="detail-value">{item_data.get('make', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Type:</span>
-                            <span class="detail-value">{item_data.get('type', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Description:</span>
-                            <span class="detail-value">{item_data.get('description', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">VIN:</span>
-                            <span class="detail-value">{item_data.get('vin', 'N/A')}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Purchase Price:</span>
-                            <span class="detail-value">${purchase_price:,.2f}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Sell Price:</span>
-                            <span class="detail-value">${sell_price:,.2f}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Sold Date:</span>
-                            <span class="detail-value">{item_data.get('sold_date', 'N/A')}</span>
-                        </div>
+    purchase_price = float(item_data.get('purchase_price', 0) or 0)
+    sell_price = float(item_data.get('sell_price', 0) or 0)
+    profit = sell_price - purchase_price
+    profit_color = 'green' if profit >= 0 else 'red'
+    
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #28a745 0%, #20c997 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
+            .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #dee2e6; border-radius: 0 0 8px 8px; }}
+            .item-details {{ background: white; padding: 15px; border-radius: 8px; margin-top: 15px; }}
+            .detail-row {{ display: flex; padding: 8px 0; border-bottom: 1px solid #f0f0f0; }}
+            .detail-label {{ font-weight: bold; width: 150px; color: #555; }}
+            .detail-value {{ flex: 1; color: #333; }}
+            .profit-highlight {{ background: {profit_color}; color: white; padding: 10px; border-radius: 8px; text-align: center; font-size: 18px; font-weight: bold; margin-top: 15px; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2 style="margin: 0;">✅ Item Sold!</h2>
+                <p style="margin: 5px 0 0 0;">An item has been marked as sold</p>
+            </div>
+            <div class="content">
+                <div class="item-details">
+                    <div class="detail-row">
+                        <span class="detail-label">Year:</span>
+                        <span class="detail-value">{item_data.get('year', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Make:</span>
+                        <span class="detail-value">{item_data.get('make', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Type:</span>
+                        <span class="detail-value">{item_data.get('type', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Description:</span>
+                        <span class="detail-value">{item_data.get('description', 'N/A')}</span>
                     </div>
-                    <div class="profit-highlight">
-                        Profit: ${profit:,.2f}
+                    <div class="detail-row">
+                        <span class="detail-label">VIN:</span>
+                        <span class="detail-value">{item_data.get('vin', 'N/A')}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Purchase Price:</span>
+                        <span class="detail-value">${purchase_price:,.2f}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Sell Price:</span>
+                        <span class="detail-value">${sell_price:,.2f}</span>
+                    </div>
+                    <div class="detail-row">
+                        <span class="detail-label">Sold Date:</span>
+                        <span class="detail-value">{item_data.get('sold_date', 'N/A')}</span>
                     </div>
                 </div>
-                <div class="footer">
-                    <p>Goodnight Trailers Inventory Management System</p>
+                <div class="profit-highlight">
+                    Profit: ${profit:,.2f}
                 </div>
             </div>
-        </body>
-        </html>
-        """
-        
-        msg = Message(
-            subject=subject,
-            recipients=recipients,
-            html=html_body
-        )
-        
-        mail.send(msg)
-        current_app.logger.info(f"Item sold alert sent to {recipients}")
+            <div class="footer">
+                <p>Goodnight Trailers Inventory Management System</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return subject, html_body
+
+def _money(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _unit_name(item):
+    """'2020 TOP HAT CAR HAULER' - trailers have a type, trucks and cars a model"""
+    return ' '.join(str(part) for part in (item.get('year'), item.get('make'), item.get('type') or item.get('model')) if part)
+
+def _digest_html(title, subtitle, header_colors, headers, rows, totals):
+    """Alert-styled HTML table of units with a totals row"""
+    header_cells = ''.join(f'<th>{header}</th>' for header in headers)
+    body_rows = ''.join('<tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>' for row in rows)
+    total_cells = ''.join(f'<td>{cell}</td>' for cell in totals)
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 800px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, {header_colors[0]} 0%, {header_colors[1]} 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
+            .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #dee2e6; border-radius: 0 0 8px 8px; }}
+            table {{ width: 100%; border-collapse: collapse; background: white; }}
+            th, td {{ padding: 8px; border-bottom: 1px solid #f0f0f0; text-align: left; }}
+            th {{ color: #555; }}
+            .totals td {{ font-weight: bold; border-top: 2px solid #dee2e6; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2 style="margin: 0;">{title}</h2>
+                <p style="margin: 5px 0 0 0;">{subtitle}</p>
+            </div>
+            <div class="content">
+                <table>
+                    <tr>{header_cells}</tr>
+                    {body_rows}
+                    <tr class="totals">{total_cells}</tr>
+                </table>
+            </div>
+            <div class="footer">
+                <p>Goodnight Trailers Inventory Management System</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+def new_items_digest_message(items):
+    """(subject, html) of one alert covering several new inventory items"""
+    purchase = sum(_money(item.get('purchase_price')) for item in items)
+    sell = sum(_money(item.get('sell_price')) for item in items)
+    subject = f"New Inventory Added: {len(items)} units"
+    html_body = _digest_html(
+        '🚛 New Inventory Alert', f'{len(items)} items have been added to your inventory', ('#667eea', '#764ba2'),
+        ['Unit', 'VIN', 'Condition', 'Purchase Price', 'Sell Price'],
+        [[_unit_name(item), item.get('vin') or 'N/A', item.get('condition') or 'N/A',
+          f"${_money(item.get('purchase_price')):,.2f}", f"${_money(item.get('sell_price')):,.2f}"] for item in items],
+        [f'Total ({len(items)} units)', '', '', f'${purchase:,.2f}', f'${sell:,.2f}']
+    )
+    return subject, html_body
+
+def sold_items_digest_message(items):
+    """(subject, html) of one alert covering several items marked as sold"""
+    purchase = sum(_money(item.get('purchase_price')) for item in items)
+    sell = sum(_money(item.get('sell_price')) for item in items)
+    subject = f"Items SOLD: {len(items)} units, profit ${sell - purchase:,.2f}"
+    html_body = _digest_html(
+        '✅ Items Sold!', f'{len(items)} items have been marked as sold', ('#28a745', '#20c997'),
+        ['Unit', 'VIN', 'Sold Date', 'Purchase Price', 'Sell Price', 'Profit'],
+        [[_unit_name(item), item.get('vin') or 'N/A', item.get('sold_date') or 'N/A',
+          f"${_money(item.get('purchase_price')):,.2f}", f"${_money(item.get('sell_price')):,.2f}",
+          f"${_money(item.get('sell_price')) - _money(item.get('purchase_price')):,.2f}"] for item in items],
+        [f'Total ({len(items)} units)', '', '', f'${purchase:,.2f}', f'${sell:,.2f}', f'${sell - purchase:,.2f}']
+    )
+    return subject, html_body
+
+def _new_item_alert(items):
+    """(recipients, subject, html) for new items - one unit's alert or a digest - or None without recipients"""
+    recipients = get_new_item_recipients()
+    if not recipients:
+        current_app.logger.warning("No alert recipients configured")
+        return None
+    return (recipients,) + (new_item_alert_message(items[0]) if len(items) == 1 else new_items_digest_message(items))
+
+def _sold_item_alert(items):
+    """(recipients, subject, html) for sold items - one unit's alert or a digest - or None without recipients"""
+    recipients = get_sold_item_recipients()
+    if not recipients:
+        current_app.logger.warning("No alert recipients configured")
+        return None
+    return (recipients,) + (item_sold_alert_message(items[0]) if len(items) == 1 else sold_items_digest_message(items))
+
+# With a digest window set, alerts are held and the outbox worker sends them through these
+register_digest('new_item', _new_item_alert)
+register_digest('item_sold', _sold_item_alert)
+
+def queue_new_item_alert(cursor, item_data):
+    """
+    Queue the new item alert in the caller's transaction; the outbox worker sends
+    it after the commit (or in the next digest when EMAIL_DIGEST_WINDOW_SECONDS is
+    set). Returns False when nobody subscribes to these alerts.
+    """
+    if EMAIL_DIGEST_WINDOW_SECONDS:
+        # Nothing is held when nobody would get the digest
+        if not get_new_item_recipients():
+            current_app.logger.warning("No alert recipients configured")
+            return False
+        hold_for_digest(cursor, 'new_item', item_data)
         return True
-        
-    except Exception as e:
-        current_app.logger.error(f"Failed to send item sold alert: {str(e)}")
-        return False
\ No newline at end of file
+    alert = _new_item_alert([item_data])
+    if alert is None:
+        return False
+    queue_email(cursor, 'new_item', *alert)
+    return True
+
+def queue_item_sold_alerts(cursor, items):
+    """
+    Queue the sold alert for one operation in the caller's transaction: the unit's
+    alert for a single item, else one digest with every unit and the totals
+    (see queue_new_item_alert).
+    """
+    if not items:
+        return False
+    if EMAIL_DIGEST_WINDOW_SECONDS:
+        if not get_sold_item_recipients():
+            current_app.logger.warning("No alert recipients configured")
+            return False
+        for item_data in items:
+            hold_for_digest(cursor, 'item_sold', item_data)
+        return True
+    alert = _sold_item_alert(items)
+    if alert is None:
+        return False
+    queue_email(cursor, 'item_sold' if len(items) == 1 else 'item_sold_digest', *alert)
+    return True
@@ -0,0 +1,62 @@
+"""
+Files produced by background export jobs, and the signed links that download them.
+
+A job writes its export to EXPORT_ARTIFACT_DIR under the job id. The download link
+carries the job id signed with the app's secret key, so it works without a session
+(e.g. pasted into another browser) but can't be forged or reused after it expires.
+Artifacts older than EXPORT_ARTIFACT_TTL_SECONDS are deleted.
+"""
+
+import os
+import time
+import logging
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ARTIFACT_DIR = os.environ.get('EXPORT_ARTIFACT_DIR', os.path.join('temp', 'exports'))
+EXPORT_ARTIFACT_TTL_SECONDS = int(os.environ.get('EXPORT_ARTIFACT_TTL_SECONDS', 24 * 3600))
+
+_SALT = 'export-download'
+
+def artifact_path(job_id, extension):
+    os.makedirs(EXPORT_ARTIFACT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_ARTIFACT_DIR, f'{job_id}.{extension}')
+
+def artifact_expired(path):
+    """True when the artifact is gone or past its expiry"""
+    try:
+        return time.time() - os.stat(path).st_mtime > EXPORT_ARTIFACT_TTL_SECONDS
+    except OSError:
+        return True
+
+def sign_download(secret_key, job_id):
+    """Token for the download link of a finished export job"""
+    return URLSafeTimedSerializer(secret_key, salt=_SALT).dumps(job_id)
+
+def load_download(secret_key, token):
+    """Job id from a download token, or None when it is invalid or expired"""
+    try:
+        return URLSafeTimedSerializer(secret_key, salt=_SALT).loads(token, max_age=EXPORT_ARTIFACT_TTL_SECONDS)
+    except SignatureExpired:
+        return None
+    except BadSignature:
+        logger.warning('Rejected export download link with a bad signature')
+        return None
+
+def purge_expired_artifacts():
+    """Delete artifacts past their expiry; returns how many were removed"""
+    try:
+        names = os.listdir(EXPORT_ARTIFACT_DIR)
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(EXPORT_ARTIFACT_DIR, name)
+        if artifact_expired(path):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove expired export {path}: {e}")
+    return removed
@@ -0,0 +1,133 @@
+"""
+On-disk cache of generated exports (CSV, XLSX, marketplace sheets).
+
+An artifact is keyed by what produced it: exporter, category, filters, the selected
+ids and the table's data version (data_version.py), which every write bumps. A
+repeat download of unchanged data is a file send; any write makes the old key
+unreachable and eviction reclaims it. The directory is bounded by size, least
+recently used first.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', os.path.join('temp', 'export_cache'))
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# Part of every key; bump when an export's layout or wording changes so old files aren't served
+EXPORT_FORMAT_VERSION = 1
+# Unfinished files older than this were left by a crashed or abandoned export
+STALE_PARTIAL_SECONDS = 3600
+
+def export_cache_key(exporter, category, filters=None, ids=None, data_version=0):
+    """Hex digest identifying one export artifact"""
+    payload = json.dumps({
+        'format': EXPORT_FORMAT_VERSION,
+        'exporter': exporter,
+        'category': category,
+        'filters': filters or {},
+        # Order of selection doesn't change the export (rows are sorted by id)
+        'ids': hashlib.sha256(','.join(str(item_id) for item_id in sorted(ids)).encode()).hexdigest() if ids else None,
+        'data_version': data_version
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _path(key, extension):
+    return os.path.join(EXPORT_CACHE_DIR, f'{key}.{extension}')
+
+def _partial_path(key, extension):
+    return os.path.join(EXPORT_CACHE_DIR, f'{key}.{uuid.uuid4().hex}.{extension}.partial')
+
+def cached_export(key, extension):
+    """Path of the cached artifact, or None. A hit counts as a use for eviction."""
+    path = _path(key, extension)
+    try:
+        stat = os.stat(path)
+        # Access time marks recency; mtime is left alone so Last-Modified stays stable
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+    except OSError:
+        return None
+
+def _publish(partial, key, extension):
+    path = _path(key, extension)
+    # Atomic, so other processes never see a half-written file
+    os.replace(partial, path)
+    evict_exports()
+    return path
+
+def store_export(key, extension, write):
+    """Generate an artifact with write(path) and cache it; returns the cached path"""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    partial = _partial_path(key, extension)
+    try:
+        write(partial)
+        return _publish(partial, key, extension)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+def stream_into_cache(key, extension, chunks):
+    """
+    Pass text chunks through to the response while writing them to the cache. The
+    file is only published when the stream completes; an abandoned download
+    leaves nothing behind.
+    """
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    partial = _partial_path(key, extension)
+    completed = False
+    try:
+        with open(partial, 'w', encoding='utf-8', newline='') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                yield chunk
+        completed = True
+        _publish(partial, key, extension)
+    finally:
+        if not completed and os.path.exists(partial):
+            os.remove(partial)
+
+def evict_exports(max_bytes=None):
+    """Delete least recently used artifacts until the cache fits in max_bytes"""
+    max_bytes = EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    now = time.time()
+    try:
+        names = os.listdir(EXPORT_CACHE_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(EXPORT_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if name.endswith('.partial'):
+            if now - stat.st_mtime > STALE_PARTIAL_SECONDS:
+                _remove(path)
+            continue
+        entries.append((stat.st_atime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if _remove(path):
+            total -= size
+            removed += 1
+    return removed
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not remove cached export {path}: {e}")
+        return False
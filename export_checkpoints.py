@@ -0,0 +1,100 @@
+"""
+Per-marketplace export checkpoints for incremental ("changes since last export")
+listing exports.
+
+A checkpoint is a position in the events change log (events.id): everything up to
+it has been exported to that marketplace. Items with events after it are either
+listable now (new or changed listings) or not (sold or deleted: removals).
+"""
+
+import sqlite3
+import logging
+from datetime import datetime
+from export_pipeline import SOLD_FILTERS
+from bulk_upsert import SQL_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Events whose item was created after the checkpoint, so it was never uploaded
+CREATE_ACTIONS = ('create', 'import')
+# The importer logs 'import' for updated rows too. Rows are matched on VIN, so only
+# a newly created row's event sets it.
+CREATED_EVENT = f"action IN ({', '.join(repr(action) for action in CREATE_ACTIONS)}) " \
+                "AND (action != 'import' OR json_extract(changes, '$.vin') IS NOT NULL)"
+
+def init_export_checkpoints_table():
+    conn = sqlite3.connect('inventory.db')
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS export_checkpoints (
+            marketplace TEXT NOT NULL,
+            category TEXT NOT NULL,
+            event_id INTEGER NOT NULL,
+            exported_at TEXT NOT NULL,
+            user_id INTEGER,
+            PRIMARY KEY (marketplace, category)
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+def latest_event_id(cursor):
+    """Current end of the change log"""
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM events')
+    return cursor.fetchone()[0]
+
+def get_checkpoint(cursor, marketplace, category):
+    """{'event_id', 'exported_at', 'user_id'} of the last export, or None"""
+    cursor.execute('''
+        SELECT event_id, exported_at, user_id FROM export_checkpoints WHERE marketplace = ? AND category = ?
+    ''', (marketplace, category))
+    row = cursor.fetchone()
+    return {'event_id': row[0], 'exported_at': row[1], 'user_id': row[2]} if row else None
+
+def save_checkpoint(cursor, marketplace, category, event_id, user_id=None):
+    """
+    Record an export up to event_id; the caller commits. A checkpoint only moves
+    forward, so downloading an older export again doesn't rewind it.
+    """
+    cursor.execute('''
+        INSERT INTO export_checkpoints (marketplace, category, event_id, exported_at, user_id)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (marketplace, category) DO UPDATE SET
+            event_id = excluded.event_id, exported_at = excluded.exported_at, user_id = excluded.user_id
+        WHERE excluded.event_id > export_checkpoints.event_id
+    ''', (marketplace, category, event_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), user_id))
+
+def changes_since(cursor, table_name, category, since_event_id, until_event_id):
+    """
+    Split the items with events in (since, until] into
+      (ids of listable items - new or changed listings,
+       [(id, reason)] of items to take down - reason 'sold' or 'deleted')
+    Items created and taken down within the window were never uploaded and are left out.
+    """
+    cursor.execute('''
+        SELECT item_id, MAX({}) FROM events
+        WHERE category = ? AND id > ? AND id <= ? AND item_id IS NOT NULL
+        GROUP BY item_id
+    '''.format(CREATED_EVENT), (category, since_event_id, until_event_id))
+    changed = dict(cursor.fetchall())
+    if not changed:
+        return [], []
+
+    current = {}
+    item_ids = list(changed)
+    for start in range(0, len(item_ids), SQL_CHUNK_SIZE):
+        chunk = item_ids[start:start + SQL_CHUNK_SIZE]
+        cursor.execute(f'''
+            SELECT id, deleted_at IS NOT NULL, {SOLD_FILTERS['unsold']}
+            FROM {table_name} WHERE id IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        current.update({item_id: (deleted, unsold) for item_id, deleted, unsold in cursor.fetchall()})
+
+    listable, removals = [], []
+    for item_id in sorted(changed):
+        deleted, unsold = current.get(item_id, (True, False))
+        if not deleted and unsold:
+            listable.append(item_id)
+        elif not changed[item_id]:
+            removals.append((item_id, 'deleted' if deleted else 'sold'))
+    return listable, removals
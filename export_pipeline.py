@@ -0,0 +1,140 @@
+import os
+import csv
+import sqlite3
+import logging
+from io import StringIO
+from xlsx_writer import XlsxExport
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_TABLES = {
+    'trailers': 'inventory',
+    'trucks': 'trucks',
+    'classic_cars': 'classic_cars'
+}
+
+# ?sold= values -> SQL condition
+SOLD_FILTERS = {
+    'all': None,
+    'unsold': "LOWER(sold) = 'no'",
+    'sold': "LOWER(sold) = 'yes'"
+}
+
+# Rows fetched from the cursor and written per chunk of a streamed export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+def table_columns(conn, table_name):
+    """Column names of a table, in table order"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table_name})').fetchall()]
+
+def build_export_query(conn, category, columns=None, sold='all', include_deleted=False):
+    """
+    Return (sql, params, columns) for the export rows of one category. sql reads one
+    page: it selects id before the columns and takes (last id, page size) after
+    params; iter_export_rows() runs it.
+
+    columns         - column names to export, in order; default every column but id
+    sold            - 'all', 'unsold' or 'sold'
+    include_deleted - also export soft-deleted rows
+
+    Raises ValueError for an unknown category, column or filter.
+    """
+    if category not in CATEGORY_TABLES:
+        raise ValueError(f'Unknown category: {category}')
+    if sold not in SOLD_FILTERS:
+        raise ValueError(f'Unknown sold filter: {sold}')
+    table_name = CATEGORY_TABLES[category]
+
+    available = table_columns(conn, table_name)
+    if columns:
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    else:
+        columns = [column for column in available if column != 'id']
+
+    conditions = ['id > ?']
+    if not include_deleted and 'deleted_at' in available:
+        conditions.append('deleted_at IS NULL')
+    if SOLD_FILTERS[sold]:
+        conditions.append(SOLD_FILTERS[sold])
+
+    sql = f"SELECT id, {', '.join(columns)} FROM {table_name} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+    return sql, (), list(columns)
+
+def iter_export_rows(sql, params, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield export rows (without the id), reading one page of batch_size rows per
+    query. The database isn't in WAL mode, so a cursor left open for a whole
+    download would hold a read lock that stalls every write; between pages none is held.
+    """
+    conn = sqlite3.connect('inventory.db')
+    try:
+        last_id = -1
+        while True:
+            rows = conn.execute(sql, tuple(params) + (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+
+def count_export_rows(conn, sql, params):
+    """Number of rows a page query from build_export_query() exports in total"""
+    # From id -1 with no limit (LIMIT -1), the page query covers every row
+    return conn.execute(f'SELECT COUNT(*) FROM ({sql})', tuple(params) + (-1, -1)).fetchone()[0]
+
+def report_rows(rows, total, progress, every=EXPORT_BATCH_SIZE):
+    """
+    Pass rows through, calling progress({'rows', 'total', 'fraction'}) every `every`
+    rows and once at the end. total may be None when it isn't known.
+    """
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % every == 0:
+            progress({'rows': count, 'total': total, 'fraction': min(count / total, 1.0) if total else None})
+    progress({'rows': count, 'total': total, 'fraction': 1.0})
+
+def csv_chunks(rows, columns, batch_size=EXPORT_BATCH_SIZE):
+    """Yield CSV text chunks: the header line, then batch_size rows at a time"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_csv(sql, params, columns, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield a CSV export as text chunks: the header line, then batch_size rows at a
+    time, so memory stays flat whatever the table size.
+    """
+    try:
+        yield from csv_chunks(iter_export_rows(sql, params, batch_size), columns, batch_size)
+    except Exception as e:
+        # Headers are already sent; all that can be done is log and end the download
+        logger.error(f"Error streaming CSV export: {e}")
+        raise
+
+def write_file_export(path, file_type, category, columns, rows):
+    """Write export rows to path as CSV or XLSX"""
+    if file_type == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        return
+    # Sheet named like the importer expects (TRAILERS, TRUCKS, CLASSIC CARS) so exports import back
+    export = XlsxExport(category.replace('_', ' ').upper(), [(column, None, None) for column in columns])
+    export.header()
+    export.write_rows(rows)
+    export.save(path)
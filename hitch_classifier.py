@@ -0,0 +1,113 @@
+"""
+Hitch type inference from an item's type and description.
+
+Text is split into word tokens once and scanned by a single Aho-Corasick automaton
+built over token sequences, so indicators only match whole words ('GN' matches
+"GN 2 5/16 BALL" but not "DESIGN") and every phrase is found in one linear pass.
+"""
+
+import re
+from collections import deque
+import pandas as pd
+
+GOOSENECK = 'Gooseneck'
+BUMPER_PULL = 'Bumper-pull'
+DEFAULT_HITCH_TYPE = BUMPER_PULL
+
+# Indicator phrases per hitch type. Checked in this order: any gooseneck evidence wins.
+# Hyphens split tokens, so 'BUMPER PULL' also covers BUMPER-PULL.
+HITCH_INDICATORS = {
+    GOOSENECK: ['GOOSENECK', 'GOOSE NECK', 'GN', 'G/N'],
+    BUMPER_PULL: ['BP', 'B/P', 'BUMPERPULL', 'BUMPER PULL'],
+}
+
+# Runs of letters/digits; a slash only joins single-character pairs (G/N, B/P, 5/W) and
+# splits everywhere else, so GOOSENECK/BP is two words. Hyphens and punctuation split too.
+TOKEN = re.compile(r'(?<![A-Z0-9/])[A-Z0-9]/[A-Z0-9](?![A-Z0-9/])|[A-Z0-9]+')
+# Never part of a phrase, so matches can't span from type into description
+FIELD_BREAK = '\x00'
+
+def tokenize(text):
+    return TOKEN.findall(str(text).upper()) if text else []
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton whose alphabet is whole tokens rather than characters"""
+
+    def __init__(self, phrases):
+        """phrases: {phrase text: label}"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase, label in phrases.items():
+            self._add(tuple(tokenize(phrase)), phrase, label)
+        self._build_failure_links()
+
+    def _add(self, tokens, phrase, label):
+        state = 0
+        for token in tokens:
+            if token not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][token] = len(self.goto) - 1
+            state = self.goto[state][token]
+        self.output[state].append((phrase, label, len(tokens)))
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, tokens):
+        """Yield (end index, phrase, label, phrase length in tokens) for every match"""
+        state = 0
+        for index, token in enumerate(tokens):
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            for phrase, label, length in self.output[state]:
+                yield index, phrase, label, length
+
+_automaton = PhraseAutomaton({
+    phrase: hitch_type for hitch_type, phrases in HITCH_INDICATORS.items() for phrase in phrases
+})
+
+def classify_hitch(type_text, description):
+    """
+    Return (hitch_type, evidence) for one item. evidence is a list of
+    (field, phrase) pairs that decided it; empty when the default was used.
+    """
+    type_tokens = tokenize(type_text)
+    tokens = type_tokens + [FIELD_BREAK] + tokenize(description)
+
+    found = {hitch_type: [] for hitch_type in HITCH_INDICATORS}
+    for end, phrase, hitch_type, _ in _automaton.find(tokens):
+        field = 'type' if end < len(type_tokens) else 'description'
+        if (field, phrase) not in found[hitch_type]:
+            found[hitch_type].append((field, phrase))
+
+    for hitch_type in HITCH_INDICATORS:
+        if found[hitch_type]:
+            return hitch_type, found[hitch_type]
+    return DEFAULT_HITCH_TYPE, []
+
+def format_evidence(evidence):
+    """'description:GN, type:G/N' for logs and dry runs"""
+    return ', '.join(f'{field}:{phrase}' for field, phrase in evidence)
+
+def classify_series(types, descriptions):
+    """
+    Classify whole columns. Returns (hitch types Series, evidence Series of
+    format_evidence strings), both aligned to the input index.
+    """
+    results = [classify_hitch(t, d) for t, d in zip(types, descriptions)]
+    hitch_types = pd.Series([hitch_type for hitch_type, _ in results], index=types.index, dtype=object)
+    evidence = pd.Series([format_evidence(e) for _, e in results], index=types.index, dtype=object)
+    return hitch_types, evidence
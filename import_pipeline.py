@@ -0,0 +1,610 @@
+import os
+import re
+import sqlite3
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import openpyxl
+from datetime import date, datetime
+from audit_log import make_event, record_events, diff_fields, current_user_id
+from bulk_upsert import bulk_upsert
+from text_normalizer import normalize_frame
+from hitch_classifier import classify_series
+
+logger = logging.getLogger(__name__)
+
+# Spreadsheet header -> inventory column
+HEADER_MAP = {
+    'LENGTH': 'length', 'YEAR': 'year', 'MAKE': 'make', 'TYPE': 'type',
+    'DIMENSIONS': 'dimensions', 'CAPACITY': 'capacity', 'DESCRIPTION': 'description',
+    'CONDITION': 'condition', 'VIN': 'vin', 'COLOR': 'color', 'HITCH_TYPE': 'hitch_type',
+    'SELL': 'sell_price', 'SOLD': 'sold', 'PURCHASE': 'purchase_price', 'SOLD_DATE': 'sold_date'
+}
+TRUCK_HEADER_MAP = {
+    'BOOM': 'boom_height', 'CAPACITY': 'weight_capacity', 'ENGINE': 'engine_type', 'TYPE': 'truck_type',
+    'MILES': 'mileage', 'SELL': 'sell_price', 'PURCHASE': 'purchase_price'
+}
+CLASSIC_CAR_HEADER_MAP = {
+    'MILES': 'mileage', 'ENGINE': 'engine_specs', 'RESTORATION': 'restoration_status',
+    'SELL': 'sell_price', 'PURCHASE': 'purchase_price'
+}
+
+TEXT_FIELDS = ['make', 'type', 'dimensions', 'capacity', 'description', 'condition', 'vin', 'color', 'hitch_type']
+INVENTORY_COLUMNS = ['length', 'year', 'make', 'type', 'dimensions', 'capacity', 'description', 'condition',
+                     'vin', 'color', 'hitch_type', 'sell_price', 'sold', 'purchase_price', 'profit', 'sold_date']
+TRUCK_COLUMNS = ['year', 'make', 'model', 'boom_height', 'weight_capacity', 'engine_type', 'hours', 'vin',
+                 'condition', 'description', 'sell_price', 'sold', 'purchase_price', 'profit', 'sold_date',
+                 'truck_type', 'mileage']
+CLASSIC_CAR_COLUMNS = ['year', 'make', 'model', 'mileage', 'engine_specs', 'transmission', 'vin',
+                       'restoration_status', 'condition', 'color', 'description', 'sell_price', 'sold',
+                       'purchase_price', 'profit', 'sold_date']
+
+# What each workbook sheet imports into. Every column's upper-cased name (SELL_PRICE,
+# BOOM_HEIGHT, ...) is accepted as a header too, so exported files import back.
+#   measure_fields - numbers written with units ('20 FT', '1,200 LBS'), stored as REAL
+#   count_fields   - whole numbers written with units ('85,000 MILES'), stored as INTEGER
+#   required       - measure field a row is rejected without
+CATEGORY_IMPORTS = {
+    'trailers': {
+        'sheet': 'TRAILERS', 'table': 'inventory', 'header_map': HEADER_MAP, 'columns': INVENTORY_COLUMNS,
+        'text_fields': TEXT_FIELDS, 'measure_fields': ['length'], 'count_fields': [], 'required': 'length'
+    },
+    'trucks': {
+        'sheet': 'TRUCKS', 'table': 'trucks', 'header_map': TRUCK_HEADER_MAP, 'columns': TRUCK_COLUMNS,
+        'text_fields': ['make', 'model', 'engine_type', 'vin', 'condition', 'description', 'truck_type'],
+        'measure_fields': ['boom_height', 'weight_capacity'], 'count_fields': ['hours', 'mileage'], 'required': None
+    },
+    'classic_cars': {
+        'sheet': 'CLASSIC CARS', 'table': 'classic_cars', 'header_map': CLASSIC_CAR_HEADER_MAP,
+        'columns': CLASSIC_CAR_COLUMNS,
+        'text_fields': ['make', 'model', 'engine_specs', 'transmission', 'vin', 'restoration_status',
+                        'condition', 'color', 'description'],
+        'measure_fields': [], 'count_fields': ['mileage'], 'required': None
+    }
+}
+
+# Rows parsed, cleaned and committed at a time; bounds import memory regardless of file size
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+# Processes parsing a multi-sheet workbook at once (one sheet each); 1 imports sheets one after another
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', min(3, os.cpu_count() or 1)))
+# Sheets are parsed in parallel but SQLite takes one writer at a time, so a worker
+# may wait this long for another sheet's chunk to commit
+IMPORT_LOCK_TIMEOUT = 60
+
+# Reasons reported for rows that are skipped
+INVALID_LENGTH = 'missing or invalid length'
+DUPLICATE_VIN = 'duplicate VIN in file (a later row wins)'
+
+class ImportTimer:
+    """Collects wall-clock seconds per named import stage"""
+
+    def __init__(self):
+        self.timings = {}
+
+    def stage(self, name):
+        timer = self
+
+        class _Stage:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.timings[name] = timer.timings.get(name, 0) + time.perf_counter() - self.start
+
+        return _Stage()
+
+def format_timings(timings):
+    """'read 0.41s, parse 0.03s, ...' for flash messages and logs"""
+    return ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items())
+
+def _file_size(file):
+    try:
+        position = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+def iter_csv_chunks(file, chunk_size):
+    """
+    Yield (DataFrame of up to chunk_size rows, fraction of the file read so far).
+    file is an open file or a path (background jobs pass the saved upload's path).
+    Cells are read as text so a column's type doesn't change from one chunk to the
+    next (e.g. VINs that look numeric).
+    """
+    if isinstance(file, (str, os.PathLike)):
+        # Opened here, in binary, so tell() is a byte offset comparable to the size
+        size = os.path.getsize(file)
+        with open(file, 'rb') as handle:
+            yield from _read_csv_chunks(handle, size, chunk_size)
+    else:
+        yield from _read_csv_chunks(file, _file_size(file), chunk_size)
+
+def _read_csv_chunks(file, size, chunk_size):
+    for chunk in pd.read_csv(file, dtype=str, chunksize=chunk_size):
+        try:
+            fraction = min(1.0, file.tell() / size) if size else None
+        except (AttributeError, OSError):
+            fraction = None
+        yield chunk, fraction
+
+def _cell(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+def iter_xlsx_chunks(file, chunk_size, sheet_name='TRAILERS'):
+    """
+    Yield (DataFrame of up to chunk_size rows, fraction of the sheet read so far)
+    from one sheet, read row by row in read-only mode.
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        sheet = workbook[sheet_name]
+        # From the sheet's stored dimensions; only used for progress, may be missing
+        total_rows = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+        width = len(columns)
+
+        # Indexed like pd.read_csv output (first data row is 0) so index + 2 is the sheet row
+        chunk, index = [], []
+        seen = 1
+        for row in rows:
+            seen += 1
+            if all(value is None or value == '' for value in row):
+                continue
+            row = list(row[:width]) + [None] * (width - len(row))
+            chunk.append([_cell(value) for value in row])
+            index.append(seen - 2)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=index), min(1.0, seen / total_rows) if total_rows else None
+                chunk, index = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=index), 1.0
+    finally:
+        workbook.close()
+
+def iter_upload_chunks(file, filename, chunk_size=IMPORT_CHUNK_SIZE, sheet_name='TRAILERS'):
+    """Stream an uploaded CSV, or one sheet of an XLSX, as (DataFrame, fraction read) chunks"""
+    if filename.endswith('.csv'):
+        return iter_csv_chunks(file, chunk_size)
+    return iter_xlsx_chunks(file, chunk_size, sheet_name)
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+def find_import_sheets(file, filename):
+    """
+    [(category, sheet name)] for every sheet of the upload that can be imported, in
+    CATEGORY_IMPORTS order. A CSV is a trailers sheet. Sheet names are matched
+    ignoring case and surrounding spaces.
+    """
+    if filename.endswith('.csv'):
+        return [('trailers', None)]
+    workbook = openpyxl.load_workbook(file, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+    _rewind(file)
+
+    by_key = {name.strip().upper(): name for name in sheet_names}
+    sheets = [(category, by_key[spec['sheet']]) for category, spec in CATEGORY_IMPORTS.items() if spec['sheet'] in by_key]
+    if not sheets:
+        expected = ', '.join(spec['sheet'] for spec in CATEGORY_IMPORTS.values())
+        raise ValueError(f"No sheet to import: expected one of {expected}")
+    return sheets
+
+def _header_key(name):
+    """'Sold Date', 'SOLD-DATE' and 'sold_date' all become 'SOLD_DATE'"""
+    return re.sub(r'[\s\-]+', '_', str(name).strip().upper())
+
+def header_lookup(category):
+    """Normalized header -> column for one category"""
+    spec = CATEGORY_IMPORTS[category]
+    lookup = {column.upper(): column for column in spec['columns']}
+    lookup.update({_header_key(header): column for header, column in spec['header_map'].items()})
+    return lookup
+
+def select_rows(df, category='trailers'):
+    """Rename spreadsheet headers and keep rows that have a make (not a total line) and a VIN"""
+    lookup = header_lookup(category)
+    df = df.rename(columns=lambda name: lookup.get(_header_key(name), name))
+    # A sheet with both SELL and SELL_PRICE columns keeps the first
+    df = df.loc[:, ~df.columns.duplicated()]
+    for column in CATEGORY_IMPORTS[category]['columns']:
+        if column not in df.columns:
+            df[column] = np.nan
+    make = df['make'].astype(str).str.strip()
+    vin = df['vin'].astype(str).str.strip()
+    keep = (
+        df['make'].notna() & (make != '') & ~make.str.lower().str.contains('total', na=False) &
+        df['vin'].notna() & (vin != '')
+    )
+    return df[keep]
+
+def _text(series):
+    """Blank cells become '' rather than the string 'nan'"""
+    return series.fillna('').astype(str).str.strip()
+
+def _measure(series):
+    """Numbers once stray characters ('20 FT', '20\'', '1,200') are removed; anything else is NaN"""
+    cleaned = _text(series).str.replace(r'[^\d.]', '', regex=True)
+    return pd.to_numeric(cleaned.where(cleaned.str.match(r'^\d*\.?\d+$')), errors='coerce').astype(float)
+
+def parse_frame(df, category='trailers'):
+    """
+    Column-wise parsing and numeric coercion. Returns (parsed DataFrame, the input
+    rows rejected for missing the category's required field, e.g. a trailer's length).
+    """
+    spec = CATEGORY_IMPORTS[category]
+    out = pd.DataFrame(index=df.index)
+    rejected = df.iloc[0:0]
+
+    required = spec['required']
+    if required:
+        value = _measure(df[required])
+        valid = value.notna()
+        rejected = df[~valid]
+        df = df[valid]
+        out = out[valid]
+        out[required] = value[valid]
+
+    for field in spec['measure_fields']:
+        if field != required:
+            out[field] = _measure(df[field])
+    for field in spec['count_fields']:
+        out[field] = np.floor(_measure(df[field])).astype('Int64')
+
+    year = pd.to_numeric(_text(df['year']), errors='coerce')
+    out['year'] = np.floor(year).astype('Int64')
+
+    for field in spec['text_fields']:
+        out[field] = _text(df[field])
+
+    out['sell_price'] = pd.to_numeric(_text(df['sell_price']), errors='coerce').astype(float)
+    out['purchase_price'] = pd.to_numeric(_text(df['purchase_price']), errors='coerce').fillna(0.0).astype(float)
+    out['profit'] = (out['sell_price'] - out['purchase_price']).fillna(0.0)
+
+    sold = _text(df['sold']).str.upper()
+    out['sold'] = sold.where((sold != '') & (sold != 'NAN'), 'No')
+
+    sold_date = _text(df['sold_date'])
+    out['sold_date'] = sold_date.where(sold_date.str.match(r'^\d{4}-\d{2}-\d{2}$', na=False), None)
+
+    return out, rejected
+
+def rejection_reason(category):
+    required = CATEGORY_IMPORTS[category]['required']
+    return INVALID_LENGTH if required == 'length' else f'missing or invalid {required}'
+
+def infer_hitch_types(df):
+    """Fill blank hitch_type from indicators in type or description (default Bumper-pull)"""
+    missing = df['hitch_type'] == ''
+    if missing.any():
+        hitch_types, _ = classify_series(df.loc[missing, 'type'], df.loc[missing, 'description'])
+        df.loc[missing, 'hitch_type'] = hitch_types
+    return df
+
+def clean_frame(df, category='trailers'):
+    """Hitch inference (trailers only) and the shared text normalization"""
+    if category == 'trailers':
+        df = infer_hitch_types(df)
+    return normalize_frame(df, category)
+
+def _records(df, columns):
+    """Rows as plain Python tuples with NaN/NA turned into None, ready for executemany"""
+    frame = df[columns].astype(object)
+    frame = frame.where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+def write_items(conn, df, category='trailers', user_id=None):
+    """Upsert parsed rows by VIN and log an import event per new or changed row"""
+    spec = CATEGORY_IMPORTS[category]
+    columns = spec['columns']
+    cursor = conn.cursor()
+    records = _records(df, columns)
+    result = bulk_upsert(cursor, spec['table'], columns, records,
+                         insert_only={'date_added': datetime.now().strftime('%Y-%m-%d')},
+                         with_before=True)
+
+    events = []
+    # One event per VIN; for repeated VINs the last row is the one that was written
+    written = {record[columns.index('vin')]: record for record in records}
+    for record in written.values():
+        row = dict(zip(columns, record))
+        item_id = result['ids'].get(row['vin'])
+        changes = diff_fields(result['before'].get(item_id, {}), row)
+        if changes:
+            events.append(make_event(category, item_id, 'import', changes, user_id))
+    record_events(cursor, events)
+    return result
+
+def _empty_totals():
+    return {
+        'rows_read': 0, 'imported': 0, 'inserted': 0, 'updated': 0, 'skipped': 0,
+        'skip_reasons': {}, 'ignored': 0, 'chunks': 0, 'fraction': 0.0
+    }
+
+def import_sheet(file, filename, category='trailers', sheet_name='TRAILERS', chunk_size=IMPORT_CHUNK_SIZE,
+                 user_id=None, progress=None):
+    """
+    Import one sheet chunk by chunk. Each chunk is cleaned and committed in its own
+    transaction, so memory stays bounded by chunk_size; if a chunk fails, the chunks
+    before it stay imported. progress, if given, is called after every chunk with
+    the running totals. Returns the final totals plus per-stage timings (seconds).
+    """
+    timer = ImportTimer()
+    totals = _empty_totals()
+    # VINs written by earlier chunks; a repeat later in the file is a duplicate, as in preview_import
+    seen_vins = set()
+
+    def skip(reason, count):
+        if count:
+            totals['skipped'] += count
+            totals['skip_reasons'][reason] = totals['skip_reasons'].get(reason, 0) + count
+
+    chunks = iter_upload_chunks(file, filename, chunk_size, sheet_name)
+    conn = sqlite3.connect('inventory.db', timeout=IMPORT_LOCK_TIMEOUT)
+    try:
+        while True:
+            with timer.stage('read'):
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    df, fraction = chunk
+                    rows_read = len(df)
+                    df = select_rows(df, category)
+            if chunk is None:
+                break
+            totals['rows_read'] += rows_read
+            # Blank, total and VIN-less lines were never counted as skipped rows
+            totals['ignored'] += rows_read - len(df)
+
+            if not df.empty:
+                with timer.stage('parse'):
+                    df, rejected = parse_frame(df, category)
+                skip(rejection_reason(category), len(rejected))
+
+                with timer.stage('clean'):
+                    df = clean_frame(df, category)
+
+                with timer.stage('write'):
+                    result = write_items(conn, df, category, user_id)
+                    conn.commit()
+
+                # The repeat is still written (the last row wins) but counts as a duplicate, not an update
+                repeats = len(seen_vins.intersection(result['ids']))
+                seen_vins.update(result['ids'])
+                totals['inserted'] += result['inserted']
+                totals['updated'] += result['updated'] - repeats
+                totals['imported'] += result['inserted'] + result['updated'] - repeats
+                skip(DUPLICATE_VIN, result['skipped'] + repeats)
+
+            totals['chunks'] += 1
+            totals['fraction'] = fraction
+            if progress:
+                progress(dict(totals, timings=dict(timer.timings)))
+    finally:
+        conn.close()
+
+    totals['fraction'] = 1.0
+    totals['timings'] = timer.timings
+    return totals
+
+def combine_totals(sheet_totals):
+    """
+    Overall totals from {category: totals, or None if not started}. Stage timings
+    are summed across sheets, so with parallel workers they can exceed the wall time.
+    """
+    combined = _empty_totals()
+    combined['timings'] = {}
+    fractions = []
+    for totals in sheet_totals.values():
+        totals = totals or {}
+        for key in ('rows_read', 'imported', 'inserted', 'updated', 'skipped', 'ignored', 'chunks'):
+            combined[key] += totals.get(key, 0)
+        for reason, count in totals.get('skip_reasons', {}).items():
+            combined['skip_reasons'][reason] = combined['skip_reasons'].get(reason, 0) + count
+        for stage, seconds in totals.get('timings', {}).items():
+            combined['timings'][stage] = combined['timings'].get(stage, 0) + seconds
+        fractions.append(totals.get('fraction', 0.0))
+    # Unknown when a sheet has no stored dimensions to measure progress against
+    combined['fraction'] = None if None in fractions else sum(fractions) / max(len(fractions), 1)
+    combined['categories'] = {category: totals for category, totals in sheet_totals.items() if totals}
+    return combined
+
+def _import_sheet_worker(path, filename, category, sheet_name, chunk_size, user_id, progress_queue):
+    """Process pool entry point: import one sheet, reporting progress through the queue"""
+    return import_sheet(path, filename, category, sheet_name, chunk_size, user_id,
+                        lambda totals: progress_queue.put((category, totals)))
+
+def _import_sheets_parallel(path, filename, sheets, chunk_size, user_id, workers, report):
+    # spawn, not fork: imports run on a background thread of the web process
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(max_workers=min(workers, len(sheets)), mp_context=context) as pool:
+            futures = {
+                pool.submit(_import_sheet_worker, path, filename, category, sheet_name, chunk_size, user_id,
+                            progress_queue): category
+                for category, sheet_name in sheets
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5)
+                # A finished worker's progress messages are all queued by now; draining them
+                # first keeps them from overwriting its final totals
+                while not progress_queue.empty():
+                    report(*progress_queue.get())
+                for future in done:
+                    report(futures[future], future.result())
+
+def run_import(file, filename, chunk_size=IMPORT_CHUNK_SIZE, user_id=None, progress=None, workers=IMPORT_WORKERS):
+    """
+    Import an uploaded CSV (trailers) or workbook. Every TRAILERS, TRUCKS and
+    CLASSIC CARS sheet is upserted into its own table; when file is a saved path and
+    there are several sheets, each one is parsed and written by its own process.
+
+    user_id defaults to the logged-in user. progress, if given, is called as chunks
+    are committed with the combined running totals. Returns the final totals (with a
+    per-category breakdown under 'categories') plus per-stage timings (seconds).
+    """
+    timer = ImportTimer()
+    if user_id is None:
+        user_id = current_user_id()
+
+    with timer.stage('total'):
+        sheets = find_import_sheets(file, filename)
+        sheet_totals = {category: None for category, _ in sheets}
+
+        def report(category, totals):
+            sheet_totals[category] = totals
+            if progress:
+                progress(combine_totals(sheet_totals))
+
+        if len(sheets) > 1 and workers > 1 and isinstance(file, (str, os.PathLike)):
+            _import_sheets_parallel(file, filename, sheets, chunk_size, user_id, workers, report)
+        else:
+            for category, sheet_name in sheets:
+                _rewind(file)
+                sheet_totals[category] = import_sheet(
+                    file, filename, category, sheet_name, chunk_size, user_id,
+                    lambda totals, category=category: report(category, totals)
+                )
+
+    result = combine_totals(sheet_totals)
+    result['fraction'] = 1.0
+    result['timings']['total'] = timer.timings['total']
+    logger.info(f"Imported {result['imported']} rows from {len(sheets)} sheet(s) in {result['chunks']} chunks "
+                f"({format_timings(result['timings'])})")
+    return result
+
+# Rows of each kind returned by a dry run
+PREVIEW_SAMPLE_SIZE = int(os.environ.get('IMPORT_PREVIEW_SAMPLE_SIZE', 50))
+
+def preview_import(file, filename, chunk_size=IMPORT_CHUNK_SIZE, sample_size=PREVIEW_SAMPLE_SIZE):
+    """
+    Dry run: parse and clean every sheet exactly like run_import(), stage each in a
+    temp table and classify its rows with one JOIN against the category's table.
+    Returns counts (overall and per category) plus samples of new units, updated
+    units (with field-level diffs) and rejected rows. Nothing is written.
+    """
+    timer = ImportTimer()
+    counts = {'rows_read': 0, 'new': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0, 'ignored': 0}
+    samples = {'new_units': [], 'updated_units': [], 'rejected_rows': []}
+    categories = {}
+
+    sheets = find_import_sheets(file, filename)
+    conn = sqlite3.connect('inventory.db')
+    try:
+        cursor = conn.cursor()
+        for category, sheet_name in sheets:
+            _rewind(file)
+            categories[category] = _preview_sheet(cursor, file, filename, category, sheet_name,
+                                                  chunk_size, sample_size, samples, timer)
+            for key in counts:
+                counts[key] += categories[category][key]
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return dict(counts, **samples, categories=categories, timings=timer.timings)
+
+def _preview_sheet(cursor, file, filename, category, sheet_name, chunk_size, sample_size, samples, timer):
+    """Stage and classify one sheet; appends to samples and returns the sheet's counts"""
+    spec = CATEGORY_IMPORTS[category]
+    columns = spec['columns']
+    counts = {'rows_read': 0, 'new': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0, 'ignored': 0}
+    source = {'category': category, 'sheet': sheet_name}
+
+    def reject(row_number, vin, reason):
+        counts['rejected'] += 1
+        if len(samples['rejected_rows']) < sample_size:
+            samples['rejected_rows'].append(dict(source, row=row_number, vin=vin, reason=reason))
+
+    cursor.execute('DROP TABLE IF EXISTS temp.import_preview')
+    cursor.execute(f'''
+        CREATE TEMP TABLE import_preview (row_number INTEGER PRIMARY KEY, {', '.join(columns)})
+    ''')
+
+    for df, _ in iter_upload_chunks(file, filename, chunk_size, sheet_name):
+        with timer.stage('read'):
+            rows_read = len(df)
+            df = select_rows(df, category)
+        counts['rows_read'] += rows_read
+        counts['ignored'] += rows_read - len(df)
+        if df.empty:
+            continue
+
+        with timer.stage('parse'):
+            df, rejected = parse_frame(df, category)
+        for index, vin in zip(rejected.index, _text(rejected['vin'])):
+            reject(int(index) + 2, vin, rejection_reason(category))
+
+        with timer.stage('clean'):
+            df = clean_frame(df, category)
+
+        with timer.stage('stage'):
+            cursor.executemany(f'''
+                INSERT INTO temp.import_preview (row_number, {', '.join(columns)})
+                VALUES ({', '.join('?' * (len(columns) + 1))})
+            ''', [(int(index) + 2,) + record for index, record in zip(df.index, _records(df, columns))])
+
+    with timer.stage('diff'):
+        # Same rule as the real import: the last row for a VIN wins
+        cursor.execute('''
+            SELECT row_number, vin FROM temp.import_preview
+            WHERE row_number NOT IN (SELECT MAX(row_number) FROM temp.import_preview GROUP BY vin)
+            ORDER BY row_number
+        ''')
+        for row_number, vin in cursor.fetchall():
+            reject(row_number, vin, DUPLICATE_VIN)
+        cursor.execute('''
+            DELETE FROM temp.import_preview
+            WHERE row_number NOT IN (SELECT MAX(row_number) FROM temp.import_preview GROUP BY vin)
+        ''')
+
+        # One pass over the staged rows; "i.vin != ''" lets the join use the partial VIN index
+        cursor.execute(f'''
+            SELECT p.row_number, {', '.join(f'p.{column}' for column in columns)}, i.*
+            FROM temp.import_preview p
+            LEFT JOIN {spec['table']} i ON i.vin = p.vin AND i.vin != ''
+            ORDER BY p.row_number, i.id
+        ''')
+        existing_columns = [description[0] for description in cursor.description][len(columns) + 1:]
+        previous_row = None
+        for row in cursor:
+            row_number = row[0]
+            if row_number == previous_row:
+                continue
+            previous_row = row_number
+            staged = dict(zip(columns, row[1:len(columns) + 1]))
+            existing = dict(zip(existing_columns, row[len(columns) + 1:]))
+
+            if existing.get('id') is None:
+                counts['new'] += 1
+                if len(samples['new_units']) < sample_size:
+                    samples['new_units'].append(dict(staged, row=row_number, **source))
+                continue
+
+            changes = diff_fields({column: existing.get(column) for column in columns}, staged)
+            if not changes:
+                counts['unchanged'] += 1
+                continue
+            counts['updated'] += 1
+            if len(samples['updated_units']) < sample_size:
+                samples['updated_units'].append(dict(
+                    source, row=row_number, id=existing['id'], vin=staged['vin'], changes=changes
+                ))
+
+    return counts
@@ -5,6 +5,7 @@ Script to link existing Google Drive folders (organized by VIN) to inventory ite
 
 import sqlite3
 from google_drive_service import get_drive_service
+from bulk_upsert import bulk_update_by_vin
 
 def get_all_vin_folders(service):
     """Get all folders from Google Drive root"""
@@ -56,21 +57,16 @@ def link_folders_to_inventory():
     for table in ['inventory', 'trucks', 'classic_cars']:
         print(f"\nProcessing {table}...")
         
-        # Get all items with VINs
-        cursor.execute(f'SELECT id, vin, google_drive_folder_id FROM {table} WHERE vin IS NOT NULL AND vin != ""')
-        items = cursor.fetchall()
+        # Only items with a VIN and no folder linked yet
+        cursor.execute(f'SELECT vin FROM {table} WHERE vin IS NOT NULL AND vin != "" AND (google_drive_folder_id IS NULL OR google_drive_folder_id = "")')
+        matches = [(vin, folders[vin]) for (vin,) in cursor.fetchall() if vin in folders]
         
-        for item_id, vin, existing_folder_id in items:
-            # Skip if already has a folder linked
-            if existing_folder_id:
-                continue
-                
-            # Check if there's a folder matching this VIN (exact match)
-            if vin in folders:
-                folder_id = folders[vin]
-                cursor.execute(f'UPDATE {table} SET google_drive_folder_id = ? WHERE id = ?', (folder_id, item_id))
-                print(f"  ✓ Linked VIN {vin} to folder ID {folder_id}")
-                updated_count += 1
+        # One batched UPDATE per table instead of one statement per item
+        linked = bulk_update_by_vin(cursor, table, ['google_drive_folder_id'], matches,
+                                    where='google_drive_folder_id IS NULL OR google_drive_folder_id = ""')
+        for vin, folder_id in matches:
+            print(f"  ✓ Linked VIN {vin} to folder ID {folder_id}")
+        updated_count += linked
     
     conn.commit()
     conn.close()
@@ -0,0 +1,208 @@
+"""
+Marketplace listing text (title, price, condition, description) for exports.
+
+Each marketplace is a template: which pieces make up the title and description,
+how they are joined, length limits, the condition wording and the sheet layout.
+A template is compiled once per category into functions that render a whole
+batch of rows column by column, reading values by column name.
+
+Adding a marketplace means adding an entry to MARKETPLACES.
+"""
+
+from functools import lru_cache
+from xlsx_writer import TITLE, NOTE, CURRENCY
+
+# Rows rendered per batch
+LISTING_BATCH_SIZE = 500
+
+LOCATION_MESSAGE = 'VISIT GOODNIGHT TRAILERS, LOCATED OFF I-27 IN CANYON!'
+
+# Our condition wording (lower-cased) -> the values marketplaces accept
+CONDITION_MAP = {
+    'new': 'New', 'brand new': 'New',
+    'excellent': 'Used - Like New', 'like new': 'Used - Like New',
+    'good': 'Used - Good', 'very good': 'Used - Good',
+    'fair': 'Used - Fair', 'acceptable': 'Used - Fair'
+}
+DEFAULT_CONDITION = 'Used - Good'
+
+# Parts: each takes {column: [values]} and returns one string per row ('' when the
+# value is missing, in which case it and its separator are left out)
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(value)
+
+def text(column, fmt=str):
+    def part(columns):
+        return [fmt(value) if value else '' for value in columns[column]]
+    return part
+
+def upper(column):
+    return text(column, lambda value: str(value).upper())
+
+def suffixed(column, suffix):
+    """'45FT BOOM' from 45.0"""
+    return text(column, lambda value: f'{_number(value)}{suffix}')
+
+def feet(column):
+    return text(column, lambda value: f'{int(value)}FT')
+
+def vin_tail(column='vin'):
+    """Last 7 characters of the VIN"""
+    return text(column, lambda value: value[-7:])
+
+def price_text(column='sell_price'):
+    return text(column, lambda value: f'${float(value):,.2f}' if float(value) > 0 else '')
+
+def size(length_column='length', width_column='dimensions'):
+    """'12FT X 83IN', or whichever of the two is known"""
+    def part(columns):
+        sizes = []
+        for length, width in zip(columns[length_column], columns[width_column]):
+            if length and width:
+                sizes.append(f'{int(length)}FT X {width}IN')
+            elif length:
+                sizes.append(f'{int(length)}FT')
+            elif width:
+                sizes.append(f'{width}IN')
+            else:
+                sizes.append('')
+        return sizes
+    return part
+
+def literal(value):
+    def part(columns):
+        return [value] * len(next(iter(columns.values()), []))
+    return part
+
+# What each category contributes to listing text, by name
+CATEGORY_PARTS = {
+    'trailers': {
+        'title': [feet('length'), text('year'), upper('make'), upper('type')],
+        'identity': [text('year'), upper('make'), upper('type')],
+        'specs': [size(), upper('capacity')],
+    },
+    'trucks': {
+        'title': [text('year'), upper('make'), upper('model'), upper('truck_type')],
+        'identity': [text('year'), upper('make'), upper('model')],
+        'specs': [suffixed('boom_height', 'FT BOOM'), suffixed('weight_capacity', ' LB CAPACITY'),
+                  suffixed('hours', ' HOURS'), suffixed('mileage', ' MILES'), upper('engine_type')],
+    },
+    'classic_cars': {
+        'title': [text('year'), upper('make'), upper('model')],
+        'identity': [text('year'), upper('make'), upper('model')],
+        'specs': [suffixed('mileage', ' MILES'), upper('engine_specs'), upper('transmission'),
+                  upper('color'), upper('restoration_status')],
+    },
+}
+
+# Shared by every category
+COMMON_PARTS = {
+    'vin': text('vin'),
+    'vin_tail': vin_tail(),
+    'notes': upper('description'),
+    'price': price_text(),
+    'location': literal(LOCATION_MESSAGE),
+}
+
+# Text fields: 'lead' part groups joined by 'join', then (separator, part) appended
+# in order, each only when that part has a value; cut to 'limit' characters.
+MARKETPLACES = {
+    'facebook': {
+        'label': 'Facebook',
+        'title': {'lead': ['title'], 'join': ' ', 'append': [(' - ', 'vin')], 'limit': 150},
+        'description': {
+            'lead': ['specs'], 'join': ', ',
+            'append': [(' - ', 'notes'), (' ', 'vin_tail'), ('. ', 'location')],
+            'limit': 5000
+        },
+        'category': 'Miscellaneous',
+        'sheet_title': 'Bulk Upload Template',
+        'download_name': 'facebook_marketplace_export.xlsx',
+        # Layout matches Facebook's bulk upload template
+        'banners': [
+            ('Facebook Marketplace Bulk Upload Template', TITLE),
+            ('You can create up to 50 listings at once. When you are finished, be sure to save or export this as an XLS/XLSX file.', NOTE)
+        ],
+        'columns': [
+            ('TITLE', 50, None, 'REQUIRED | Plain text (up to 150 characters'),
+            ('PRICE', 12, CURRENCY, 'REQUIRED | A whole number in $'),
+            ('CONDITION', 20, None, 'REQUIRED | Supported values: "New"; "Used - Like New"; "Used - Good"; "Used - Fair"'),
+            ('DESCRIPTION', 80, None, 'OPTIONAL | Plain text (up to 5000 characters)'),
+            ('CATEGORY', 20, None, 'OPTIONAL | Type of listing')
+        ]
+    },
+    'squarespace': {
+        'label': 'Squarespace',
+        'title': {'lead': ['title'], 'join': ' ', 'append': [(' - ', 'vin')], 'limit': 150},
+        # No location message; the price goes in the text instead
+        'description': {
+            'lead': ['identity', 'specs'], 'join': ', ',
+            'append': [(' - ', 'notes'), (' ', 'vin_tail'), (' - ', 'price')],
+            'limit': 5000
+        },
+        'category': None,
+        'sheet_title': 'Squarespace Export',
+        'download_name': 'squarespace_export.xlsx',
+        'banners': [
+            ('Squarespace Marketplace Export', TITLE),
+            ('Export for Squarespace or other marketplaces. Save as XLS/XLSX file.', NOTE)
+        ],
+        'columns': [
+            ('TITLE', 50, None, 'REQUIRED | Plain text (up to 150 characters)'),
+            ('PRICE', 12, CURRENCY, 'REQUIRED | A whole number in $'),
+            ('CONDITION', 20, None, 'REQUIRED | Condition'),
+            ('DESCRIPTION', 80, None, 'OPTIONAL | Plain text (up to 5000 characters)')
+        ]
+    },
+}
+
+def _compile_text(spec, category):
+    """Resolve a text spec's part names once; returns render(columns) -> [str]"""
+    named = dict(COMMON_PARTS, **CATEGORY_PARTS[category])
+    lead = [part for name in spec['lead'] for part in (named[name] if isinstance(named[name], list) else [named[name]])]
+    append = [(separator, named[name]) for separator, name in spec['append']]
+    join, limit = spec['join'], spec['limit']
+
+    def render(columns):
+        texts = [join.join(value for value in values if value) for values in zip(*(part(columns) for part in lead))]
+        for separator, part in append:
+            texts = [f'{text}{separator}{value}' if text and value else text or value
+                     for text, value in zip(texts, part(columns))]
+        return [text[:limit] for text in texts]
+    return render
+
+@lru_cache(maxsize=None)
+def compile_listing_template(marketplace, category):
+    """
+    Compile a marketplace template for one category. Returns render(columns) that
+    turns a column-oriented batch {column: [values]} into export rows.
+    Raises KeyError for an unknown marketplace or category.
+    """
+    template = MARKETPLACES[marketplace]
+    if category not in CATEGORY_PARTS:
+        raise KeyError(category)
+    render_title = _compile_text(template['title'], category)
+    render_description = _compile_text(template['description'], category)
+    listing_category = template['category']
+
+    def render(columns):
+        titles = render_title(columns)
+        descriptions = render_description(columns)
+        prices = [float(value) if value else 0.0 for value in columns['sell_price']]
+        conditions = [CONDITION_MAP.get((value or '').lower(), DEFAULT_CONDITION) for value in columns['condition']]
+        if listing_category is None:
+            return [list(row) for row in zip(titles, prices, conditions, descriptions)]
+        return [[title, price, condition, description, listing_category]
+                for title, price, condition, description in zip(titles, prices, conditions, descriptions)]
+    return render
+
+def iter_listing_rows(cursor, render, batch_size=LISTING_BATCH_SIZE):
+    """Render an executed cursor's rows batch by batch, yielding export rows"""
+    names = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from render(dict(zip(names, zip(*rows))))
@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Token bucket sizes: how many attempts may be made back to back, per client IP and per username
+LOGIN_IP_BURST = int(os.environ.get('LOGIN_IP_BURST', 10))
+LOGIN_USER_BURST = int(os.environ.get('LOGIN_USER_BURST', 5))
+# Seconds to earn back one attempt
+LOGIN_REFILL_SECONDS = float(os.environ.get('LOGIN_REFILL_SECONDS', 12))
+# 'memory' (per process) or 'sqlite' (shared by all workers through inventory.db)
+LOGIN_THROTTLE_STORE = os.environ.get('LOGIN_THROTTLE_STORE', 'memory')
+# Werkzeug hash method for stored passwords, e.g. 'pbkdf2:sha256:600000'.
+# Existing hashes are moved to this method the next time their owner logs in.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+# Behind a reverse proxy every request shares the proxy's address; trust X-Forwarded-For there
+LOGIN_TRUST_PROXY = os.environ.get('LOGIN_TRUST_PROXY', 'False') == 'True'
+
+class MemoryBucketStore:
+    """Token buckets held in this process"""
+
+    # Above this many tracked keys, buckets that have refilled completely are dropped
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets):
+        """
+        Take one token from each of buckets [(key, capacity, refill_seconds)], or none if
+        any is empty. Returns seconds to wait (0 if the tokens were taken).
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = _refilled_levels(buckets, self._buckets.get, now)
+            wait = _wait_seconds(buckets, levels)
+            if wait:
+                return wait
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now, _full_after(buckets))
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _prune(self, now, full_after):
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+
+class SQLiteBucketStore:
+    """Token buckets in inventory.db so every worker process shares the same limits"""
+
+    def __init__(self):
+        conn = sqlite3.connect('inventory.db')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS login_throttle (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def take(self, buckets):
+        """See MemoryBucketStore.take"""
+        now = time.time()
+        conn = sqlite3.connect('inventory.db', timeout=5, isolation_level=None)
+        try:
+            # Write lock up front so concurrent workers can't both spend the last token
+            conn.execute('BEGIN IMMEDIATE')
+            rows = {key: (tokens, updated_at) for key, tokens, updated_at in conn.execute(
+                f'''SELECT key, tokens, updated_at FROM login_throttle
+                   WHERE key IN ({','.join('?' * len(buckets))})''', [key for key, _, _ in buckets])}
+            levels = _refilled_levels(buckets, rows.get, now)
+            wait = _wait_seconds(buckets, levels)
+            if not wait:
+                conn.executemany('''
+                    INSERT INTO login_throttle (key, tokens, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                ''', [(key, tokens - 1, now) for (key, _, _), tokens in zip(buckets, levels)])
+                # A bucket that has refilled completely is the same as no row; drop those so
+                # a client trying many usernames can't grow the table without bound
+                conn.execute('DELETE FROM login_throttle WHERE updated_at < ?', (now - _full_after(buckets),))
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def reset(self, key):
+        conn = sqlite3.connect('inventory.db', timeout=5)
+        conn.execute('DELETE FROM login_throttle WHERE key = ?', (key,))
+        conn.commit()
+        conn.close()
+
+def _refilled_levels(buckets, lookup, now):
+    """Tokens in each bucket now; lookup(key) gives (tokens, updated_at) or None for a full bucket"""
+    levels = []
+    for key, capacity, refill_seconds in buckets:
+        tokens, updated_at = lookup(key) or (capacity, now)
+        levels.append(min(capacity, tokens + max(0, now - updated_at) / refill_seconds))
+    return levels
+
+def _wait_seconds(buckets, levels):
+    """Seconds until every bucket has a token again (0 if they all have one now)"""
+    return max(max(0, 1 - tokens) * refill_seconds for (_, _, refill_seconds), tokens in zip(buckets, levels))
+
+def _full_after(buckets):
+    """Seconds after which any of these buckets, left alone, is full again"""
+    return max(capacity * refill_seconds for _, capacity, refill_seconds in buckets)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_throttle_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteBucketStore() if LOGIN_THROTTLE_STORE == 'sqlite' else MemoryBucketStore()
+    return _store
+
+def client_ip(request):
+    """Address used for the per-IP login limit"""
+    if LOGIN_TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr
+
+def check_login_allowed(ip, username):
+    """
+    Spend one login attempt for this IP and username. Both limits are checked before
+    either is spent, so an attempt refused by one doesn't use up the other. Returns
+    seconds the caller must wait before retrying, or 0 if the attempt may go ahead
+    (and be hashed).
+    """
+    buckets = [(f'ip:{ip}', LOGIN_IP_BURST, LOGIN_REFILL_SECONDS)]
+    if username:
+        buckets.append((f'user:{username.lower()}', LOGIN_USER_BURST, LOGIN_REFILL_SECONDS))
+    try:
+        return get_throttle_store().take(buckets)
+    except Exception as e:
+        # A throttle store failure must not lock everyone out
+        logger.error(f"Login throttle unavailable: {e}")
+        return 0
+
+def reset_login_attempts(username):
+    """Give a user their full attempt budget back after a successful login"""
+    try:
+        get_throttle_store().reset(f'user:{username.lower()}')
+    except Exception as e:
+        logger.error(f"Error resetting login throttle: {e}")
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+_configured_prefix = None
+
+def needs_rehash(password_hash):
+    """True if a stored hash was made with a different method or work factor than configured"""
+    global _configured_prefix
+    if _configured_prefix is None:
+        # Werkzeug fills in its default iteration count, so read the full method back from a real hash
+        _configured_prefix = hash_password('').split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _configured_prefix
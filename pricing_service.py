@@ -0,0 +1,160 @@
+import sqlite3
+import re
+import threading
+import logging
+import numpy as np
+from data_version import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each feature in the distance. Numeric features are
+# divided by their spread across sold units before weighting.
+NUMERIC_WEIGHTS = np.array([3.0, 1.0, 1.5])  # length, year, capacity
+MAKE_WEIGHT = 1.0
+TYPE_WEIGHT = 2.0
+HITCH_WEIGHT = 1.5
+# Distance contributed by a numeric feature that is missing on either side
+MISSING_PENALTY = 1.0
+
+_index = None
+_index_lock = threading.Lock()
+
+def parse_capacity(value):
+    """Turn capacity text like '10K', '7000 LBS' or '14.5 K' into pounds"""
+    if value is None:
+        return np.nan
+    match = re.search(r'(\d+(?:\.\d+)?)\s*(K\b)?', str(value).upper())
+    if not match:
+        return np.nan
+    amount = float(match.group(1))
+    return amount * 1000 if match.group(2) else amount
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, '') else np.nan
+    except (ValueError, TypeError):
+        return np.nan
+
+def _normalize_label(value):
+    return str(value).strip().upper() if value else ''
+
+class SoldInventoryIndex:
+    """Feature matrix of sold trailers used for nearest-neighbour price lookups"""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.numeric = np.array([
+            [_to_float(row[1]), _to_float(row[2]), parse_capacity(row[5])]
+            for row in rows
+        ], dtype=np.float64).reshape(len(rows), 3)
+        self.prices = np.array([float(row[7]) for row in rows], dtype=np.float64)
+        self.rows = rows
+
+        # Spread of each numeric column, so a foot of length and a year of age are comparable
+        with np.errstate(all='ignore'):
+            scale = np.nanstd(self.numeric, axis=0) if len(rows) else np.ones(3)
+        self.scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+
+        # Categorical columns are stored as integer codes for vectorized equality tests
+        self.make_codes, self.make_vocab = self._encode([row[3] for row in rows])
+        self.type_codes, self.type_vocab = self._encode([row[4] for row in rows])
+        self.hitch_codes, self.hitch_vocab = self._encode([row[6] for row in rows])
+
+    @staticmethod
+    def _encode(values):
+        vocab = {}
+        codes = np.array([vocab.setdefault(_normalize_label(v), len(vocab)) for v in values], dtype=np.int32)
+        return codes, vocab
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, length=None, year=None, make=None, type=None, capacity=None, hitch_type=None, k=5):
+        """Return (indices, distances) of the k sold units closest to the given spec"""
+        target = np.array([_to_float(length), _to_float(year), parse_capacity(capacity)], dtype=np.float64)
+
+        diff = (self.numeric - target) / self.scale
+        numeric_terms = np.where(np.isnan(diff), MISSING_PENALTY, diff * diff)
+        distance = numeric_terms @ NUMERIC_WEIGHTS
+
+        # Unknown labels get code -1 and therefore never match
+        for codes, vocab, label, weight in (
+            (self.make_codes, self.make_vocab, make, MAKE_WEIGHT),
+            (self.type_codes, self.type_vocab, type, TYPE_WEIGHT),
+            (self.hitch_codes, self.hitch_vocab, hitch_type, HITCH_WEIGHT),
+        ):
+            label = _normalize_label(label)
+            if label:
+                distance += weight * (codes != vocab.get(label, -1))
+
+        distance = np.sqrt(distance)
+        k = min(k, len(distance))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([])
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest])]
+        return nearest, distance[nearest]
+
+def _load_index(cursor, version):
+    cursor.execute('''
+        SELECT id, length, year, make, type, capacity, hitch_type, sell_price, sold_date, vin
+        FROM inventory
+        WHERE (sold = "YES" OR sold = "yes" OR sold = "Yes")
+        AND deleted_at IS NULL
+        AND sell_price IS NOT NULL AND sell_price > 0
+    ''')
+    return SoldInventoryIndex(cursor.fetchall(), version)
+
+def get_sold_index():
+    """Return the cached sold-inventory index, rebuilding it if the data version moved"""
+    global _index
+    conn = sqlite3.connect('inventory.db')
+    try:
+        cursor = conn.cursor()
+        version = get_data_version(cursor, 'inventory')
+        if _index is not None and _index.version == version:
+            return _index
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = _load_index(cursor, version)
+                logger.info(f"Rebuilt pricing index with {len(_index)} sold units (version {version})")
+            return _index
+    finally:
+        conn.close()
+
+def suggest_price(length=None, year=None, make=None, type=None, capacity=None, hitch_type=None, k=5):
+    """Suggest a sell price range from the k most similar sold trailers"""
+    index = get_sold_index()
+    nearest, distances = index.query(length=length, year=year, make=make, type=type,
+                                     capacity=capacity, hitch_type=hitch_type, k=k)
+
+    comparables = []
+    for i, dist in zip(nearest, distances):
+        row = index.rows[i]
+        comparables.append({
+            'id': row[0],
+            'length': row[1],
+            'year': row[2],
+            'make': row[3],
+            'type': row[4],
+            'capacity': row[5],
+            'hitch_type': row[6],
+            'sell_price': row[7],
+            'sold_date': row[8],
+            'vin': row[9],
+            'distance': round(float(dist), 3)
+        })
+
+    if len(nearest) == 0:
+        return {'comparables': [], 'suggested_price': None, 'price_low': None, 'price_high': None}
+
+    prices = index.prices[nearest]
+    # Closer comparables count more towards the point estimate
+    weights = 1.0 / (1.0 + distances)
+    return {
+        'comparables': comparables,
+        'suggested_price': round(float(np.average(prices, weights=weights)), 2),
+        'price_low': round(float(np.percentile(prices, 25)), 2),
+        'price_high': round(float(np.percentile(prices, 75)), 2)
+    }
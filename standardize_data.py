@@ -1,22 +1,133 @@
-import sqlite3
+#!/usr/bin/env python3
+"""
+Re-apply the spelling/spacing rule table (text_normalizer.NORMALIZATION_RULES) to items
+already in the database, so old rows match what the importer and item forms now store.
+Only the rule table runs here: the import-only trailer steps (dropping TRAILER, FT
+measurements and hitch words) never touch stored rows.
+
+    python standardize_data.py                  # all categories
+    python standardize_data.py --category trailers --dry-run
+    python standardize_data.py --benchmark      # per-row cost, changes nothing
+"""
+
+import argparse
 import re
+import sqlite3
+import time
+import pandas as pd
+from text_normalizer import NORMALIZATION_RULES, NORMALIZED_FIELDS, normalize_text, normalize_series
+from audit_log import init_events_table, make_event, record_events, diff_fields
+
+CATEGORY_TABLES = {
+    'trailers': 'inventory',
+    'trucks': 'trucks',
+    'classic_cars': 'classic_cars'
+}
+
+def load_items(conn, category):
+    """Id plus the normalized text columns, blanks as ''"""
+    columns = NORMALIZED_FIELDS[category]
+    df = pd.read_sql_query(f'SELECT id, {", ".join(columns)} FROM {CATEGORY_TABLES[category]}', conn)
+    for column in columns:
+        df[column] = df[column].fillna('').astype(str)
+    return df
+
+def standardize_category(conn, category, dry_run=False):
+    """Apply the rule table to one category's rows; returns the number of rows changed"""
+    before = load_items(conn, category)
+    if before.empty:
+        return 0
+    fields = NORMALIZED_FIELDS[category]
+    after = before.copy()
+    for field in fields:
+        after[field] = normalize_series(after[field])
+
+    changed = (after[fields] != before[fields]).any(axis=1)
+    if not changed.any():
+        return 0
+
+    before_rows = before[changed].set_index('id')[fields].to_dict('index')
+    after_rows = after[changed].set_index('id')[fields].to_dict('index')
+
+    if dry_run:
+        for item_id in list(after_rows)[:20]:
+            print(f"  #{item_id}: {diff_fields(before_rows[item_id], after_rows[item_id])}")
+        if len(after_rows) > 20:
+            print(f"  ... and {len(after_rows) - 20} more")
+        return len(after_rows)
+
+    cursor = conn.cursor()
+    # Unchanged fields are passed as NULL and kept by COALESCE, so NULLs stay NULL
+    cursor.executemany(
+        f'UPDATE {CATEGORY_TABLES[category]} SET {", ".join(f"{field} = COALESCE(?, {field})" for field in fields)} WHERE id = ?',
+        [tuple(row[field] if row[field] != before_rows[item_id][field] else None for field in fields) + (item_id,)
+         for item_id, row in after_rows.items()]
+    )
+    record_events(cursor, [
+        make_event(category, item_id, 'update', diff_fields(before_rows[item_id], row))
+        for item_id, row in after_rows.items()
+    ])
+    conn.commit()
+    return len(after_rows)
+
+def benchmark(conn, repeat=3):
+    """Time the old one-re.sub-per-rule approach against the compiled single pass"""
+    values = []
+    for category in CATEGORY_TABLES:
+        df = load_items(conn, category)
+        for field in NORMALIZED_FIELDS[category]:
+            values.extend(v for v in df[field] if v)
+    if not values:
+        print("No values to benchmark")
+        return
+
+    sequential = [(re.compile(pattern, re.IGNORECASE), replacement) for _, pattern, replacement in NORMALIZATION_RULES]
+
+    def run_sequential():
+        for value in values:
+            for pattern, replacement in sequential:
+                value = pattern.sub(replacement, value)
+
+    def run_single_pass():
+        for value in values:
+            normalize_text(value)
+
+    series = pd.Series(values)
+
+    def run_vectorized():
+        normalize_series(series)
+
+    print(f"{len(values)} values, best of {repeat}:")
+    for label, func in [('one re.sub per rule', run_sequential),
+                        ('single pass', run_single_pass),
+                        ('single pass, Series', run_vectorized)]:
+        best = min(_timed(func) for _ in range(repeat))
+        print(f"  {label:<22} {best:.3f}s  {best / len(values) * 1e6:.1f} us/value")
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Normalize item text with the shared cleanup rules')
+    parser.add_argument('--category', choices=list(CATEGORY_TABLES), help='only this category (default: all)')
+    parser.add_argument('--dry-run', action='store_true', help='show what would change without writing')
+    parser.add_argument('--benchmark', action='store_true', help='report per-value normalization cost and exit')
+    args = parser.parse_args()
+
+    if not args.dry_run and not args.benchmark:
+        init_events_table()
+    conn = sqlite3.connect('inventory.db')
+    try:
+        if args.benchmark:
+            benchmark(conn)
+            return
+        for category in ([args.category] if args.category else CATEGORY_TABLES):
+            count = standardize_category(conn, category, dry_run=args.dry_run)
+            print(f"{category}: {count} rows {'would change' if args.dry_run else 'updated'}")
+    finally:
+        conn.close()
 
-conn = sqlite3.connect('inventory.db')
-cursor = conn.cursor()
-
-# Get all text columns to search and replace ALUIM/ALIUM/ALUMN with ALUM
-text_columns = ['type', 'description', 'dimensions', 'capacity', 'condition', 'color', 'make', 'vin']
-
-for column in text_columns:
-    cursor.execute(f"SELECT id, {column} FROM inventory WHERE {column} IS NOT NULL")
-    rows = cursor.fetchall()
-    
-    for row_id, col_val in rows:
-        if col_val:
-            # Replace ALUIM, ALIUM, and ALUMN with ALUM (case insensitive)
-            cleaned = re.sub(r'ALUIM', 'ALUM', str(col_val), flags=re.IGNORECASE)
-            cleaned = re.sub(r'ALIUM', 'ALUM', cleaned, flags=re.IGNORECASE)
-            cleaned = re.sub(r'ALUMN', 'ALUM', cleaned, flags=re.IGNORECASE)
-            
-            if cleaned != col_val:
-                cursor.execute(f"UPDATE inventory SET {column} = ? WHERE id = ?", (cleaned, row_id))
\ No newline at end of file
+if __name__ == '__main__':
+    main()
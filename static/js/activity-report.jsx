@@ -4,19 +4,22 @@ const ActivityReport = () => {
   const [loading, setLoading] = React.useState(true);
   const [error, setError] = React.useState('');
   const [soldItems, setSoldItems] = React.useState([]);
+  const [days, setDays] = React.useState(7);
+  const [counts, setCounts] = React.useState({ new: 0, deleted: 0, sold: 0 });
 
   React.useEffect(() => {
     fetchReport();
-  }, []);
+  }, [days]);
 
   const fetchReport = async () => {
   try {
     setLoading(true);
-    const response = await fetch('/admin/api/activity-report');
+    const response = await fetch(`/admin/api/activity-report?days=${days}&per_page=1000`);
     const data = await response.json();
     setNewItems(data.new_items || []);
     setDeletedItems(data.deleted_items || []);
-    setSoldItems(data.sold_items || []);  // ADD THIS
+    setSoldItems(data.sold_items || []);
+    setCounts(data.counts || { new: 0, deleted: 0, sold: 0 });
   } catch (err) {
     setError('Error loading report');
     console.error(err);
@@ -58,9 +61,19 @@ const ActivityReport = () => {
       }}>
         <div>
           <h2 style={{ margin: 0 }}><i className="bi bi-clock-history"></i> Activity Report</h2>
-          <p style={{ margin: '5px 0 0 0', opacity: 0.9 }}>Last 7 Days - New and Deleted Items</p>
+          <p style={{ margin: '5px 0 0 0', opacity: 0.9 }}>Last {days} Days - New, Sold and Deleted Items</p>
         </div>
-        <div>
+        <div className="d-flex align-items-center">
+          <select
+            className="form-select me-2"
+            style={{ width: 'auto' }}
+            value={days}
+            onChange={(e) => setDays(parseInt(e.target.value))}
+          >
+            <option value={7}>Last 7 days</option>
+            <option value={30}>Last 30 days</option>
+            <option value={90}>Last 90 days</option>
+          </select>
           <a href="/" className="btn btn-light me-2">
             <i className="bi bi-arrow-left"></i> Back to Inventory
           </a>
@@ -84,10 +97,10 @@ const ActivityReport = () => {
             boxShadow: '0 2px 8px rgba(0,0,0,0.1)'
           }}>
             <h4 className="mb-3" style={{ color: '#28a745' }}>
-              <i className="bi bi-plus-circle"></i> New Items ({newItems.length})
+              <i className="bi bi-plus-circle"></i> New Items ({counts.new})
             </h4>
             {newItems.length === 0 ? (
-              <p className="text-muted">No new items in the last 7 days</p>
+              <p className="text-muted">No new items in the last {days} days</p>
             ) : (
               <div className="table-responsive">
                 <table className="table table-sm table-hover">
@@ -126,10 +139,10 @@ const ActivityReport = () => {
             boxShadow: '0 2px 8px rgba(0,0,0,0.1)'
           }}>
             <h4 className="mb-3" style={{ color: '#28a745' }}>
-              <i className="bi bi-check-circle"></i> Sold Items ({soldItems.length})
+              <i className="bi bi-check-circle"></i> Sold Items ({counts.sold})
             </h4>
             {soldItems.length === 0 ? (
-              <p className="text-muted">No items sold in the last 7 days</p>
+              <p className="text-muted">No items sold in the last {days} days</p>
             ) : (
               <div className="table-responsive">
                 <table className="table table-sm table-hover">
@@ -168,10 +181,10 @@ const ActivityReport = () => {
             boxShadow: '0 2px 8px rgba(0,0,0,0.1)'
           }}>
             <h4 className="mb-3" style={{ color: '#dc3545' }}>
-              <i className="bi bi-trash"></i> Deleted Items ({deletedItems.length})
+              <i className="bi bi-trash"></i> Deleted Items ({counts.deleted})
             </h4>
             {deletedItems.length === 0 ? (
-              <p className="text-muted">No deleted items in the last 7 days</p>
+              <p className="text-muted">No deleted items in the last {days} days</p>
             ) : (
               <div className="table-responsive">
                 <table className="table table-sm table-hover">
@@ -6,6 +6,7 @@ const ItemForm = ({ itemId, mode }) => {
   const [options, setOptions] = React.useState({});
   const [formData, setFormData] = React.useState({});
   const [customFields, setCustomFields] = React.useState({});
+  const [priceSuggestion, setPriceSuggestion] = React.useState(null);
 
   React.useEffect(() => {
     fetchFormData();
@@ -157,6 +158,25 @@ const fetchFormData = async () => {
     }
   };
 
+  const fetchPriceSuggestion = async () => {
+    const params = new URLSearchParams();
+    ['length', 'year', 'make', 'type', 'capacity', 'hitch_type'].forEach(field => {
+      if (formData[field]) params.append(field, formData[field]);
+    });
+
+    try {
+      const response = await fetch(`/api/pricing/suggest?${params.toString()}`);
+      const data = await response.json();
+      if (response.ok) {
+        setPriceSuggestion(data);
+      } else {
+        setMessage({ type: 'danger', text: data.error || 'Error getting price suggestion' });
+      }
+    } catch (err) {
+      setMessage({ type: 'danger', text: 'Error getting price suggestion' });
+    }
+  };
+
   const calculateProfit = () => {
     const sell = parseFloat(formData.sell_price) || 0;
     const purchase = parseFloat(formData.purchase_price) || 0;
@@ -258,6 +278,11 @@ const fetchFormData = async () => {
                 onChange={(e) => handleChange('sell_price', e.target.value)}
                 required
                 />
+                {category === 'trailers' && (
+                  <button type="button" className="btn btn-link btn-sm p-0 mt-1" onClick={fetchPriceSuggestion}>
+                    <i className="bi bi-lightbulb"></i> Suggest price from sold units
+                  </button>
+                )}
             </div>
             
             <div className="col-md-4">
@@ -281,6 +306,26 @@ const fetchFormData = async () => {
                 />
             </div>
             
+            {priceSuggestion && priceSuggestion.suggested_price !== null && (
+              <div className="col-12">
+                <div className="alert alert-info mb-0">
+                  <strong>Suggested: ${priceSuggestion.suggested_price.toFixed(2)}</strong>
+                  {' '}(range ${priceSuggestion.price_low.toFixed(2)} - ${priceSuggestion.price_high.toFixed(2)})
+                  <button type="button" className="btn btn-sm btn-outline-primary ms-2"
+                    onClick={() => handleChange('sell_price', priceSuggestion.suggested_price)}>
+                    Use
+                  </button>
+                  <ul className="mb-0 mt-2 small">
+                    {priceSuggestion.comparables.map(comp => (
+                      <li key={comp.id}>
+                        {comp.length}FT {comp.year} {comp.make} {comp.type} - ${Number(comp.sell_price).toFixed(2)} (sold {comp.sold_date || 'N/A'})
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              </div>
+            )}
+
             <div className="col-md-6">
               <label className="form-label fw-bold">Sold Status</label>
               <select 
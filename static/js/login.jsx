@@ -27,6 +27,10 @@ const LoginPage = () => {
       } else if (response.status === 401) {
         setError('Invalid username or password');
         setLoading(false);
+      } else if (response.status === 429) {
+        const wait = response.headers.get('Retry-After');
+        setError(`Too many login attempts. Please try again in ${wait || 'a few'} seconds.`);
+        setLoading(false);
       } else {
         setError('An error occurred. Please try again.');
         setLoading(false);
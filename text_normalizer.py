@@ -0,0 +1,152 @@
+"""
+Text normalization shared by the importer, the item forms and standardize_data.py.
+
+Every spelling/spacing/terminology rule lives in NORMALIZATION_RULES. The rules are
+compiled into a single alternation regex so each value is scanned once, and the
+name of the alternative that matched picks the replacement.
+
+The item forms only get the rule table (normalize_fields). The trailer-specific steps
+that drop words from type and description are for imported rows only.
+"""
+
+import re
+
+# (name, pattern, replacement). Replacements are strings or functions of the match.
+# Patterns must not use numbered groups; use named groups prefixed with the rule name.
+NORMALIZATION_RULES = [
+    ('alum', r'\b(?:ALUIM|ALUMN|ALIUM)\b', 'ALUM'),
+    ('beige', r'\bBIEGE\b', 'BEIGE'),
+    ('cargo', r'\bDARGO\b', 'CARGO'),
+    ('with', r'\bWUTH\b', 'WITH'),
+    ('welding', r'\b(?:WEILDING|WIELDING)\b', 'WELDING'),
+    # "8 FT" / "8.FT" -> "8FT"
+    ('feet', r'(?P<feet_n>\d+)(?:\s+|\.)FT\b', lambda m: m.group('feet_n') + 'FT'),
+    # "10 K" -> "10K"
+    ('kilo', r'(?P<kilo_n>\d+)\s+K\b', lambda m: m.group('kilo_n') + 'K'),
+    ('hd', r'\bH\s+D\b', 'HD'),
+    ('car_hauler', r'\bCARHAULER\b', 'CAR HAULER'),
+    ('deck_over', r'\bDECKOVER\b', 'DECK OVER'),
+    ('gooseneck', r'\bGOOSE\s+NECK\b', 'GOOSENECK'),
+    ('equipment', r'\bEQUIP\b', 'EQUIPMENT'),
+]
+
+# Fields the rule table is applied to, per category
+NORMALIZED_FIELDS = {
+    'trailers': ['make', 'type', 'description', 'dimensions', 'capacity', 'color'],
+    'trucks': ['make', 'model', 'description', 'truck_type', 'engine_type'],
+    'classic_cars': ['make', 'model', 'description', 'color', 'engine_specs', 'transmission'],
+}
+
+HITCH_KEYWORDS = re.compile(
+    r'\bGN\b|\bG/N\b|\bGOOSENECK\b|\bGOOSE\s+NECK\b|\bBP\b|\bB/P\b|\bBUMPER\b|\bBUMPERPULL\b|\bBUMPER\s+PULL\b|\bBUMPER-PULL\b',
+    re.IGNORECASE
+)
+FEET_MEASUREMENT = re.compile(r'\b\d+\.?\s*FT\b', re.IGNORECASE)
+TRAILER_WORD = re.compile(r'\bTRAILER\b', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+DOUBLE_COMMA = re.compile(r',\s*,')
+EDGE_COMMA = re.compile(r'^\s*,\s*|\s*,\s*$')
+
+def _compile_rules(rules):
+    pattern = re.compile('|'.join(f'(?P<{name}>{regex})' for name, regex, _ in rules), re.IGNORECASE)
+    dispatch = {
+        name: replacement if callable(replacement) else (lambda m, text=replacement: text)
+        for name, _, replacement in rules
+    }
+    return pattern, dispatch
+
+RULES_PATTERN, RULE_DISPATCH = _compile_rules(NORMALIZATION_RULES)
+
+def _replace(match):
+    # lastgroup is the outermost named group that matched, i.e. the rule name
+    return RULE_DISPATCH[match.lastgroup](match)
+
+def normalize_text(text):
+    """Apply the rule table to one value in a single pass"""
+    if not text:
+        return text
+    return RULES_PATTERN.sub(_replace, str(text).strip()).strip()
+
+def normalize_series(series):
+    """Apply the rule table to a pandas Series of strings in a single pass per value"""
+    return series.str.strip().str.replace(RULES_PATTERN, _replace, regex=True).str.strip()
+
+def _collapse(text):
+    return WHITESPACE.sub(' ', text).strip()
+
+def strip_hitch_words(text):
+    """Drop hitch words (GN, B/P, BUMPER PULL, ...) and the commas and spaces they leave"""
+    text = _collapse(HITCH_KEYWORDS.sub('', text))
+    text = DOUBLE_COMMA.sub(',', text)
+    return EDGE_COMMA.sub('', text)
+
+def normalize_fields(data, category='trailers'):
+    """Apply the rule table to an item dict's text fields in place and return it"""
+    for field in NORMALIZED_FIELDS.get(category, []):
+        if data.get(field) and isinstance(data[field], str):
+            data[field] = normalize_text(data[field])
+    return data
+
+def normalize_item(data, category='trailers'):
+    """
+    Normalize an imported item dict in place and return it; normalize_frame() for one
+    row. For trailers this also: uppercases capacity and dimensions, drops FT
+    measurements from the description when length is set, drops "TRAILER" from type,
+    and drops hitch words from type and description once hitch_type is filled.
+    """
+    normalize_fields(data, category)
+
+    if category != 'trailers':
+        return data
+
+    for field in ('capacity', 'dimensions'):
+        if data.get(field):
+            data[field] = str(data[field]).upper().strip()
+
+    if data.get('description'):
+        desc = data['description']
+        if data.get('length'):
+            desc = _collapse(FEET_MEASUREMENT.sub('', desc))
+        if desc.startswith('. '):
+            desc = desc[2:].strip()
+        data['description'] = desc
+
+    if data.get('type'):
+        data['type'] = _collapse(TRAILER_WORD.sub('', data['type']))
+
+    if data.get('hitch_type'):
+        if data.get('description'):
+            data['description'] = strip_hitch_words(data['description'])
+        if data.get('type'):
+            data['type'] = _collapse(HITCH_KEYWORDS.sub('', data['type']))
+
+    return data
+
+def _collapse_series(series):
+    return series.str.replace(WHITESPACE, ' ', regex=True).str.strip()
+
+def normalize_frame(df, category='trailers'):
+    """Vectorized normalize_item() over a DataFrame whose text columns hold strings ('' for blank)"""
+    for field in NORMALIZED_FIELDS.get(category, []):
+        if field in df.columns:
+            df[field] = normalize_series(df[field])
+
+    if category != 'trailers':
+        return df
+
+    df['capacity'] = df['capacity'].str.upper().str.strip()
+    df['dimensions'] = df['dimensions'].str.upper().str.strip()
+
+    has_length = df['length'].fillna(0) != 0
+    desc = df['description']
+    desc = desc.where(~has_length, _collapse_series(desc.str.replace(FEET_MEASUREMENT, '', regex=True)))
+    desc = desc.where(~desc.str.startswith('. '), desc.str[2:].str.strip())
+
+    df['type'] = _collapse_series(df['type'].str.replace(TRAILER_WORD, '', regex=True))
+
+    has_hitch = df['hitch_type'] != ''
+    stripped = _collapse_series(desc.str.replace(HITCH_KEYWORDS, '', regex=True))
+    stripped = stripped.str.replace(DOUBLE_COMMA, ',', regex=True).str.replace(EDGE_COMMA, '', regex=True)
+    df['description'] = desc.where(~has_hitch, stripped)
+    df['type'] = df['type'].where(~has_hitch, _collapse_series(df['type'].str.replace(HITCH_KEYWORDS, '', regex=True)))
+    return df
@@ -1,63 +1,97 @@
-import sqlite3
+#!/usr/bin/env python3
+"""
+Backfill hitch_type for trailers that don't have one, using the same classifier as
+the importer (hitch_classifier.py), then drop hitch words from type and description
+as the importer does, and tidy what that leaves in type (spaced single letters,
+repeated words). Other text is left alone; see standardize_data.py for spelling.
+
+    python update_hitch_types.py --dry-run   # show each decision and its evidence
+    python update_hitch_types.py
+"""
+
 import re
+import argparse
+import sqlite3
+from hitch_classifier import classify_hitch, format_evidence
+from text_normalizer import strip_hitch_words
+from audit_log import init_events_table, make_event, record_events, diff_fields
+
+# "H D" -> "HD", "D T" -> "DT"
+SPACED_LETTERS = re.compile(r'\b([A-Z])\s+([A-Z])\b')
+# "DUMP DUMP" -> "DUMP"
+REPEATED_WORD = re.compile(r'\b(\w+)\s+\1\b')
+WHITESPACE = re.compile(r'\s+')
+
+def tidy_type(type_text):
+    cleaned = SPACED_LETTERS.sub(r'\1\2', type_text)
+    cleaned = REPEATED_WORD.sub(r'\1', cleaned)
+    return WHITESPACE.sub(' ', cleaned).strip()
+
+def backfill_hitch_types(conn, dry_run=False):
+    """Classify trailers with a blank hitch_type; returns the number of rows filled"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, type, description FROM inventory WHERE hitch_type IS NULL OR hitch_type = ''")
+    decisions = [(item_id, *classify_hitch(type_text, description)) for item_id, type_text, description in cursor.fetchall()]
+
+    if dry_run:
+        for item_id, hitch_type, evidence in decisions:
+            print(f"  #{item_id}: {hitch_type} ({format_evidence(evidence) or 'default'})")
+        return len(decisions)
+
+    cursor.executemany('UPDATE inventory SET hitch_type = ? WHERE id = ?',
+                       [(hitch_type, item_id) for item_id, hitch_type, _ in decisions])
+    record_events(cursor, [
+        make_event('trailers', item_id, 'update', {'hitch_type': [None, hitch_type]})
+        for item_id, hitch_type, _ in decisions
+    ])
+    conn.commit()
+    return len(decisions)
+
+def clean_trailer_text(conn, dry_run=False):
+    """
+    Drop hitch words from type and description (the hitch type now records them) and
+    tidy type; returns the number of rows changed
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, type, description FROM inventory WHERE hitch_type IS NOT NULL AND hitch_type != ''")
+    changes = []
+    for item_id, type_text, description in cursor.fetchall():
+        before = {'type': type_text, 'description': description}
+        after = {'type': tidy_type(strip_hitch_words(type_text)) if type_text else type_text,
+                 'description': strip_hitch_words(description) if description else description}
+        if after != before:
+            changes.append((item_id, diff_fields(before, after), after))
+
+    if dry_run:
+        for item_id, diff, _ in changes[:20]:
+            print(f"  #{item_id}: {diff}")
+        if len(changes) > 20:
+            print(f"  ... and {len(changes) - 20} more")
+        return len(changes)
+
+    cursor.executemany('UPDATE inventory SET type = ?, description = ? WHERE id = ?',
+                       [(after['type'], after['description'], item_id) for item_id, _, after in changes])
+    record_events(cursor, [make_event('trailers', item_id, 'update', diff) for item_id, diff, _ in changes])
+    conn.commit()
+    return len(changes)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill in missing trailer hitch types')
+    parser.add_argument('--dry-run', action='store_true', help='show what would change without writing')
+    args = parser.parse_args()
+
+    if not args.dry_run:
+        init_events_table()
+    conn = sqlite3.connect('inventory.db')
+    try:
+        filled = backfill_hitch_types(conn, dry_run=args.dry_run)
+        print(f"{filled} hitch types {'would be filled' if args.dry_run else 'filled'}")
+        cleaned = clean_trailer_text(conn, dry_run=args.dry_run)
+        print(f"{cleaned} trailers {'would be cleaned' if args.dry_run else 'cleaned'}")
+    finally:
+        conn.close()
+    if not args.dry_run:
+        print("Hitch type update completed successfully!")
 
-conn = sqlite3.connect('inventory.db')
-cursor = conn.cursor()
-
-# Update Hitch Type from Description
-cursor.execute("UPDATE inventory SET hitch_type = 'Gooseneck' WHERE hitch_type IS NULL AND (Description LIKE '%Gooseneck%' OR Description LIKE '%Goose neck%' OR Description LIKE '%GN%' OR Description LIKE '%G/N%')")
-cursor.execute("UPDATE inventory SET hitch_type = 'Gooseneck' WHERE hitch_type IS NULL AND (type LIKE '%Gooseneck%' OR type LIKE '%Goose neck%' OR type LIKE '%GN%' OR type LIKE '%G/N%')")
-cursor.execute("UPDATE inventory SET hitch_type = 'Bumper-pull' WHERE hitch_type IS NULL AND (Description LIKE '%BP%' OR Description LIKE '%Bumperpull%' OR Description LIKE '%Bumper Pull%' OR Description LIKE '%B/P%')")
-cursor.execute("UPDATE inventory SET hitch_type = 'Bumper-pull' WHERE hitch_type IS NULL AND (type LIKE '%BP%' OR type LIKE '%Bumperpull%' OR type LIKE '%Bumper Pull%' OR type LIKE '%Bumper-pull%' OR type LIKE '%B/P%')")
-cursor.execute("UPDATE inventory SET hitch_type = 'Bumper-pull' WHERE hitch_type IS NULL")
-
-# Clean Description
-cursor.execute("UPDATE inventory SET Description = REPLACE(Description, 'Gooseneck', '') WHERE Description LIKE '%Gooseneck%'")
-cursor.execute("UPDATE inventory SET Description = REPLACE(Description, 'Goose neck', '') WHERE Description LIKE '%Goose neck%'")
-cursor.execute("UPDATE inventory SET Description = REPLACE(Description, 'G/N', '') WHERE Description LIKE '%G/N%'")
-cursor.execute("UPDATE inventory SET Description = REPLACE(Description, 'Bumper Pull', '') WHERE Description LIKE '%Bumper Pull%'")
-cursor.execute("UPDATE inventory SET Description = REPLACE(Description, 'B/P', '') WHERE Description LIKE '%B/P%'")
-
-# Clean Type - remove hitch indicators
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Gooseneck', '') WHERE type LIKE '%Gooseneck%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'G/N', '') WHERE type LIKE '%G/N%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Bumper Pull', '') WHERE type LIKE '%Bumper Pull%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Bumper-pull', '') WHERE type LIKE '%Bumper-pull%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'B/P', '') WHERE type LIKE '%B/P%'")
-
-# Replace DT with Dump Trailer
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'DT', 'Dump Trailer') WHERE type LIKE '%DT%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'D T', 'Dump Trailer') WHERE type LIKE '%D T%'")
-
-# Standardize all Car Hauler variations to CAR HAULER (all caps)
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Car Hauler', 'CAR HAULER') WHERE type LIKE '%Car Hauler%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Carhauler', 'CAR HAULER') WHERE type LIKE '%Carhauler%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'CarHauler', 'CAR HAULER') WHERE type LIKE '%CarHauler%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'car hauler', 'CAR HAULER') WHERE type LIKE '%car hauler%'")
-
-# Standardize all Deckover variations to DECK OVER (all caps with space)
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'DECKOVER', 'DECK OVER') WHERE type LIKE '%DECKOVER%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Deckover', 'DECK OVER') WHERE type LIKE '%Deckover%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'DeckOver', 'DECK OVER') WHERE type LIKE '%DeckOver%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'deckover', 'DECK OVER') WHERE type LIKE '%deckover%'")
-cursor.execute("UPDATE inventory SET type = REPLACE(type, 'Deck Over', 'DECK OVER') WHERE type LIKE '%Deck Over%'")
-
-# Get all rows and clean up spaced abbreviations
-cursor.execute("SELECT id, type FROM inventory WHERE type IS NOT NULL")
-rows = cursor.fetchall()
-
-for row_id, type_val in rows:
-    if type_val:
-        # Remove spaced single letters (H D -> HD, D T -> DT, etc)
-        cleaned = re.sub(r'([A-Z])\s+([A-Z])(?=\s|$)', r'\1\2', type_val)
-        # Remove duplicate consecutive words
-        cleaned = re.sub(r'\b(\w+)\s+\1\b', r'\1', cleaned)
-        # Clean up extra spaces
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-        
-        if cleaned != type_val:
-            cursor.execute("UPDATE inventory SET type = ? WHERE id = ?", (cleaned, row_id))
-
-conn.commit()
-conn.close()
-print("Hitch type update completed successfully!")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import os
+import time
+import threading
+
+# Seconds a loaded user stays cached. Admin changes invalidate explicitly, the TTL
+# bounds staleness for changes made by another worker process.
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+_users = {}
+_lock = threading.Lock()
+
+def get_cached_user(user_id):
+    """Return the cached user object for user_id, or None if missing or expired"""
+    entry = _users.get(str(user_id))
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if time.monotonic() >= expires_at:
+        with _lock:
+            # Only drop the entry we looked at, not a fresher one stored meanwhile
+            if _users.get(str(user_id)) is entry:
+                del _users[str(user_id)]
+        return None
+    return user
+
+def cache_user(user_id, user):
+    """Store a loaded user object"""
+    with _lock:
+        _users[str(user_id)] = (user, time.monotonic() + USER_CACHE_TTL)
+
+def invalidate_user(user_id):
+    """Drop one user, e.g. after their account or settings change"""
+    with _lock:
+        _users.pop(str(user_id), None)
+
+def invalidate_all_users():
+    """Drop every cached user, e.g. after a group's permissions change"""
+    with _lock:
+        _users.clear()
+
+_anonymous_permissions = None
+
+def get_cached_anonymous_permissions():
+    """Return the cached anonymous-group permission tuple, or None if missing or expired"""
+    entry = _anonymous_permissions
+    if entry is None or time.monotonic() >= entry[1]:
+        return None
+    return entry[0]
+
+def cache_anonymous_permissions(permissions):
+    """Store the anonymous group's (can_view, can_view_financial, can_view_summary, can_view_sold)"""
+    global _anonymous_permissions
+    _anonymous_permissions = (permissions, time.monotonic() + USER_CACHE_TTL)
+
+def invalidate_anonymous_permissions():
+    """Force the next anonymous request to reload its group's permissions"""
+    global _anonymous_permissions
+    _anonymous_permissions = None
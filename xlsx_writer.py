@@ -0,0 +1,93 @@
+"""
+Streaming XLSX generation for exports.
+
+Workbooks are built in openpyxl's write-only mode: rows are serialized as they are
+appended instead of being kept as cell objects, so an export can be fed straight
+from a database cursor. Formatting comes from a few named styles registered once
+per workbook rather than Font/Alignment objects set on every cell.
+"""
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Named style -> formatting, shared by every export
+EXPORT_STYLES = {
+    'Export Title': {'font': Font(bold=True, size=11), 'alignment': Alignment(horizontal='left', vertical='center')},
+    'Export Note': {'alignment': Alignment(horizontal='left', vertical='center', wrap_text=True)},
+    'Export Requirement': {'alignment': Alignment(wrap_text=True, vertical='top')},
+    'Export Header': {'font': Font(bold=True)},
+    'Export Currency': {'number_format': '$#,##0.00'},
+}
+
+TITLE = 'Export Title'
+NOTE = 'Export Note'
+REQUIREMENT = 'Export Requirement'
+HEADER = 'Export Header'
+CURRENCY = 'Export Currency'
+
+class XlsxExport:
+    """
+    Write-only workbook, starting with one sheet; add_sheet() starts another.
+
+    columns - list of (header, width or None, data style name or None)
+
+    Rows go to the most recently added sheet, top to bottom: banner() rows merged
+    across every column, requirement and header rows, then data rows. Column widths
+    are fixed when a sheet is added.
+    """
+
+    def __init__(self, sheet_title, columns):
+        self.workbook = Workbook(write_only=True)
+        for name, formatting in EXPORT_STYLES.items():
+            self.workbook.add_named_style(NamedStyle(name=name, **formatting))
+        self.add_sheet(sheet_title, columns)
+
+    def add_sheet(self, sheet_title, columns):
+        self.sheet = self.workbook.create_sheet(sheet_title)
+        self.columns = columns
+        self.row_count = 0
+
+        for index, (_, width, _) in enumerate(columns, start=1):
+            if width:
+                self.sheet.column_dimensions[get_column_letter(index)].width = width
+        # Only the styled columns need cell objects; everything else is written as plain values
+        self._data_styles = [(index, style) for index, (_, _, style) in enumerate(columns) if style]
+
+    def _cell(self, value, style):
+        cell = WriteOnlyCell(self.sheet, value=value)
+        cell.style = style
+        return cell
+
+    def _append(self, values):
+        self.sheet.append(values)
+        self.row_count += 1
+
+    def banner(self, text, style=TITLE):
+        """A row of text merged across every column"""
+        self._append([self._cell(text, style)])
+        if len(self.columns) > 1:
+            self.sheet.merged_cells.add(f'A{self.row_count}:{get_column_letter(len(self.columns))}{self.row_count}')
+
+    def styled_row(self, values, style):
+        self._append([self._cell(value, style) for value in values])
+
+    def header(self):
+        self.styled_row([header for header, _, _ in self.columns], HEADER)
+
+    def write_rows(self, rows):
+        """Append data rows (sequences of values), applying each column's style"""
+        styles = self._data_styles
+        for row in rows:
+            if styles:
+                row = list(row)
+                for index, style in styles:
+                    row[index] = self._cell(row[index], style)
+            self._append(row)
+
+    def save(self, target):
+        """Finish the workbook into a path or binary file object"""
+        self.workbook.save(target)